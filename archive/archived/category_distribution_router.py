@@ -1,6 +1,7 @@
 # routers/category_router.py
 from fastapi import APIRouter, HTTPException, Query
-from database.connection import execute_query, QueryOptions
+from fastapi.responses import ORJSONResponse
+from database.connection import execute_query, QueryOptions, response_cache
 from typing import List, Optional
 from pydantic import BaseModel
 
@@ -20,22 +21,35 @@ class CategoryDistribution(BaseModel):
     fill: str
 
 
+# Color palette for categories, assigned in rank order
+COLOR_PALETTE = (
+    '#00255a', '#199ef3', '#3179c0', '#5590d6', '#84abdd',
+    '#adc5e5', '#c3d5ec', '#d1e3f6', '#e4eef9', '#f0f6fc'
+)
+
 router = APIRouter()
 
-@router.get("/category-distribution", response_model=List[CategoryDistribution])
+@router.get("/category-distribution", response_model=List[CategoryDistribution], response_class=ORJSONResponse)
 async def get_category_distribution(ingredient: str = Query(..., description="Ingredient name")):
     try:
+        # Normalize at entry so e.g. "Garlic" and "garlic " share one cache entry
+        ingredient = ingredient.strip()
+        cache_key = ("category-distribution", ingredient.lower())
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         ingredient_pattern = f"'%{ingredient}%'"
         
         category_distribution_query = f"""
         WITH ingredient_counts AS (
             SELECT 
                 general_category,
-                EXTRACT(YEAR FROM dish_date_created) AS year,
+                year,
                 COUNT(*) AS count
             FROM ingredient_details
             WHERE ingredient_name ILIKE {ingredient_pattern}
-            GROUP BY general_category, year, dish_date_created
+            GROUP BY general_category, year
         ),
         pivoted AS (
             SELECT
@@ -71,26 +85,22 @@ async def get_category_distribution(ingredient: str = Query(..., description="In
             options=QueryOptions(cacheable=True, ttl=3600000)
         )
         
-        if result["rows"]:
-            color_palette = [
-                '#00255a', '#199ef3', '#3179c0', '#5590d6', '#84abdd',
-                '#adc5e5', '#c3d5ec', '#d1e3f6', '#e4eef9', '#f0f6fc'
-            ]
-            
-            categories = []
-            for index, row in enumerate(result["rows"]):
-                categories.append(CategoryDistribution(
-                    name=str(row["name"]),
-                    value=float(row["value"]) if row["value"] is not None else 0.0,
-                    dish_count=int(row["dish_count"]),
-                    count_2023=int(row["count_2023"]) if row["count_2023"] is not None else 0,
-                    yoy_growth_percentage=float(row["yoy_growth_percentage"]) if row["yoy_growth_percentage"] is not None else None,
-                    fill=color_palette[index % len(color_palette)]
-                ))
-            
-            return categories
+        # Rows come from our own query with the column types already fixed, so
+        # skip per-row validation; an empty result yields an empty list
+        categories = [
+            CategoryDistribution.model_construct(
+                name=row["name"],
+                value=row["value"] if row["value"] is not None else 0.0,
+                dish_count=row["dish_count"],
+                count_2023=row["count_2023"] if row["count_2023"] is not None else 0,
+                yoy_growth_percentage=row["yoy_growth_percentage"],
+                fill=COLOR_PALETTE[index % len(COLOR_PALETTE)]
+            )
+            for index, row in enumerate(result["rows"])
+        ]
         
-        return []
+        response_cache.set(cache_key, categories)
+        return categories
         
     except Exception as e:
         print(f"Database query error: {e}")
@@ -1,6 +1,7 @@
 # routers/category_penetration_router.py
 from fastapi import APIRouter, HTTPException, Query
-from database.connection import execute_query, QueryOptions
+from fastapi.responses import ORJSONResponse
+from database.connection import execute_query, QueryOptions, response_cache
 from pydantic import BaseModel
 from typing import List
 
@@ -15,102 +16,93 @@ class CategoryPenetration(BaseModel):
 class CategoryPenetrationData(BaseModel):
     categories: List[CategoryPenetration]
 
+# Color palette for categories, assigned in rank order
+COLOR_PALETTE = (
+    '#00255a', '#199ef3', '#3179c0', '#5590d6', '#84abdd',
+    '#adc5e5', '#c3d5ec', '#d1e3f6', '#e4eef9', '#f0f6fc'
+)
+
+# Query text is fixed so only the bound ingredient pattern ($1) varies between
+# requests. Ingredient counts come from the ingredient_category_yearly roll-up,
+# matched on the lowercased name, instead of scanning ingredient_details
+CATEGORY_PENETRATION_QUERY = """
+WITH ingredient_counts AS (
+    -- Single scan of the ingredient's rows for both the penetration
+    -- numerator and the recent/older growth counts
+    SELECT 
+        general_category,
+        SUM(row_count) AS ingredient_count,
+        COALESCE(SUM(row_count) FILTER (WHERE year >= EXTRACT(YEAR FROM CURRENT_DATE) - 1), 0) AS recent,
+        COALESCE(SUM(row_count) FILTER (WHERE year = EXTRACT(YEAR FROM CURRENT_DATE) - 2), 0) AS older
+    FROM 
+        ingredient_category_yearly
+    WHERE 
+        ingredient_name_lower LIKE $1
+        AND general_category IS NOT NULL
+    GROUP BY 
+        general_category
+)
+SELECT 
+    ic.general_category AS name,
+    ROUND((ic.ingredient_count * 100.0 / NULLIF(ct.total_count, 0)), 1) AS penetration,
+    CASE
+        WHEN ic.older = 0 AND ic.recent > 0 THEN 50.0
+        WHEN ic.older = 0 THEN 0.0
+        ELSE ROUND((ic.recent - ic.older) * 100.0 / NULLIF(ic.older, 0), 1)
+    END AS growth,
+    CASE
+        WHEN ic.older = 0 AND ic.recent > 0 THEN 'Hot'
+        WHEN ic.older = 0 THEN 'New'
+        WHEN ic.recent > ic.older * 1.25 THEN 'Hot'
+        WHEN ic.recent > ic.older * 1.1 THEN 'Rising'
+        WHEN ic.recent >= ic.older * 0.9 THEN 'Stable'
+        ELSE 'Declining'
+    END AS status
+FROM 
+    ingredient_counts ic
+JOIN 
+    category_totals ct ON ic.general_category = ct.general_category
+ORDER BY 
+    penetration DESC
+LIMIT 10;
+"""
+
 router = APIRouter()
 
-@router.get("/category-penetration", response_model=CategoryPenetrationData)
+@router.get("/category-penetration", response_model=CategoryPenetrationData, response_class=ORJSONResponse)
 async def get_category_penetration(ingredient: str = Query(..., description="Ingredient name")):
     try:
-        ingredient_pattern = f"'%{ingredient}%'"
-        
-        # Color palette for categories
-        color_palette = [
-            '#00255a', '#199ef3', '#3179c0', '#5590d6', '#84abdd',
-            '#adc5e5', '#c3d5ec', '#d1e3f6', '#e4eef9', '#f0f6fc'
-        ]
+        # Normalize at entry so e.g. "Garlic" and "garlic " share one cache entry
+        ingredient = ingredient.strip()
+        cache_key = ("category-penetration", ingredient.lower())
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return cached
         
-        category_penetration_query = f"""
-        WITH category_counts AS (
-            SELECT 
-                general_category,
-                COUNT(*) AS ingredient_count
-            FROM 
-                ingredient_details
-            WHERE 
-                ingredient_name ILIKE {ingredient_pattern}
-                AND general_category IS NOT NULL
-            GROUP BY 
-                general_category
-        ),
-        total_counts AS (
-            SELECT 
-                general_category,
-                COUNT(*) AS total_count
-            FROM 
-                ingredient_details
-            WHERE 
-                general_category IS NOT NULL
-            GROUP BY 
-                general_category
-        ),
-        growth_data AS (
-            SELECT 
-                general_category,
-                COUNT(CASE WHEN EXTRACT(YEAR FROM dish_date_created) >= EXTRACT(YEAR FROM CURRENT_DATE) - 1 
-                      THEN 1 ELSE NULL END) AS recent,
-                COUNT(CASE WHEN EXTRACT(YEAR FROM dish_date_created) = EXTRACT(YEAR FROM CURRENT_DATE) - 2 
-                      THEN 1 ELSE NULL END) AS older
-            FROM 
-                ingredient_details
-            WHERE 
-                ingredient_name ILIKE {ingredient_pattern}
-                AND general_category IS NOT NULL
-            GROUP BY 
-                general_category
-        )
-        SELECT 
-            cc.general_category AS name,
-            ROUND((cc.ingredient_count * 100.0 / NULLIF(tc.total_count, 0)), 1) AS penetration,
-            CASE
-                WHEN gd.older = 0 AND gd.recent > 0 THEN 50.0
-                WHEN gd.older = 0 THEN 0.0
-                ELSE ROUND((gd.recent - gd.older) * 100.0 / NULLIF(gd.older, 0), 1)
-            END AS growth,
-            CASE
-                WHEN gd.older = 0 AND gd.recent > 0 THEN 'Hot'
-                WHEN gd.older = 0 THEN 'New'
-                WHEN gd.recent > gd.older * 1.25 THEN 'Hot'
-                WHEN gd.recent > gd.older * 1.1 THEN 'Rising'
-                WHEN gd.recent >= gd.older * 0.9 THEN 'Stable'
-                ELSE 'Declining'
-            END AS status
-        FROM 
-            category_counts cc
-        JOIN 
-            total_counts tc ON cc.general_category = tc.general_category
-        LEFT JOIN
-            growth_data gd ON cc.general_category = gd.general_category
-        ORDER BY 
-            penetration DESC
-        LIMIT 10;
-        """
+        ingredient_pattern = f"%{ingredient.lower()}%"
         
         result = await execute_query(
-            category_penetration_query,
+            CATEGORY_PENETRATION_QUERY,
+            [ingredient_pattern],
             options=QueryOptions(cacheable=True, ttl=3600000)
         )
         
-        categories = []
-        if result["rows"]:
-            for index, row in enumerate(result["rows"]):
-                categories.append(CategoryPenetration(
-                    name=str(row["name"]),
-                    penetration=float(row["penetration"]) if row["penetration"] is not None else 0.0,
-                    growth=float(row["growth"]) if row["growth"] is not None else 0.0,
-                    status=str(row["status"]),
-                    color=color_palette[index % len(color_palette)]
-                ))
+        # Rows come from our own query with the column types already fixed, so
+        # skip per-row validation
+        categories = [
+            CategoryPenetration.model_construct(
+                name=row["name"],
+                penetration=row["penetration"] if row["penetration"] is not None else 0.0,
+                growth=row["growth"] if row["growth"] is not None else 0.0,
+                status=row["status"],
+                color=COLOR_PALETTE[index % len(COLOR_PALETTE)]
+            )
+            for index, row in enumerate(result["rows"])
+        ]
         
-        return CategoryPenetrationData(categories=categories)
+        penetration_data = CategoryPenetrationData(categories=categories)
+        response_cache.set(cache_key, penetration_data)
+        return penetration_data
         
     except Exception as e:
         print(f"Database query error: {e}")
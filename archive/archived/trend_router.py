@@ -77,11 +77,10 @@ async def get_category_trends(ingredient: str = Query(..., description="Ingredie
         ingredient_pattern = f"'%{ingredient}%'"
         
         years_query = f"""
-        SELECT DISTINCT 
-            EXTRACT(YEAR FROM dish_date_created)::INTEGER AS year
+        SELECT DISTINCT year
         FROM ingredient_details
-        WHERE EXTRACT(YEAR FROM dish_date_created) >= 2018
-            AND EXTRACT(YEAR FROM dish_date_created) <= EXTRACT(YEAR FROM CURRENT_DATE)
+        WHERE year >= 2018
+            AND year <= EXTRACT(YEAR FROM CURRENT_DATE)
         ORDER BY year ASC
         LIMIT 7;
         """
@@ -89,26 +88,26 @@ async def get_category_trends(ingredient: str = Query(..., description="Ingredie
         category_trends_query = f"""
         WITH yearly_category_totals AS (
             SELECT 
-                EXTRACT(YEAR FROM dish_date_created)::INTEGER AS year,
+                year,
                 COALESCE(general_category, 'Other') AS category,
                 COUNT(DISTINCT dish_id) AS total_dishes
             FROM ingredient_details
-            WHERE EXTRACT(YEAR FROM dish_date_created) >= 2018
-                AND EXTRACT(YEAR FROM dish_date_created) <= EXTRACT(YEAR FROM CURRENT_DATE)
+            WHERE year >= 2018
+                AND year <= EXTRACT(YEAR FROM CURRENT_DATE)
                 AND general_category IS NOT NULL
-            GROUP BY EXTRACT(YEAR FROM dish_date_created), general_category
+            GROUP BY year, general_category
         ),
         yearly_category_ingredient AS (
             SELECT 
-                EXTRACT(YEAR FROM dish_date_created)::INTEGER AS year,
+                year,
                 COALESCE(general_category, 'Other') AS category,
                 COUNT(DISTINCT dish_id) AS ingredient_dishes
             FROM ingredient_details
             WHERE ingredient_name ILIKE {ingredient_pattern}
-                AND EXTRACT(YEAR FROM dish_date_created) >= 2018
-                AND EXTRACT(YEAR FROM dish_date_created) <= EXTRACT(YEAR FROM CURRENT_DATE)
+                AND year >= 2018
+                AND year <= EXTRACT(YEAR FROM CURRENT_DATE)
                 AND general_category IS NOT NULL
-            GROUP BY EXTRACT(YEAR FROM dish_date_created), general_category
+            GROUP BY year, general_category
         )
         SELECT 
             yct.year,
@@ -26,6 +26,11 @@ class Settings(BaseSettings):
     # Cache settings
     default_cache_ttl: int = 3600000  # 1 hour in milliseconds
     enable_caching: bool = True
+    query_cache_maxsize: int = 1024
+    response_cache_ttl: int = 600000  # 10 minutes in milliseconds
+    response_cache_maxsize: int = 512
+    negative_cache_ttl: int = 60000  # 1 minute in milliseconds
+    admin_token: Optional[str] = None  # Required by POST /cache/clear; unset disables it
     
     # Rate limiting settings
     enable_rate_limiting: bool = True
@@ -1,6 +1,6 @@
 # database/connection.py (Optimized for MotherDuck)
 import duckdb
-from typing import Dict, List, Any
+from typing import Dict, Iterable, List, Any, Hashable, Optional
 from dataclasses import dataclass
 import hashlib
 import time
@@ -10,15 +10,19 @@ from config import settings
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+FETCH_BATCH_SIZE = 1024  # Rows pulled from the result per fetchmany() call
+
 @dataclass
 class QueryOptions:
     cacheable: bool = False
     ttl: int = settings.default_cache_ttl
+    raw_rows: bool = False  # Return rows as tuples in SELECT column order instead of dicts
 
 class DatabaseConnection:
     def __init__(self):
         self.connection = None
         self.cache: Dict[str, Dict[str, Any]] = {}
+        self.cache_generation = 0  # Bumped on every clear so cache-derived ETags change
         self._initialized = False
         
     async def connect(self):
@@ -57,9 +61,9 @@ class DatabaseConnection:
             self._initialized = False
             raise e
     
-    def _generate_cache_key(self, query: str, params: List[Any]) -> str:
-        """Generate cache key from query and parameters"""
-        content = f"{query}:{str(params)}"
+    def _generate_cache_key(self, query: str, params: List[Any], raw_rows: bool = False) -> str:
+        """Generate cache key from query, parameters and row format"""
+        content = f"{query}:{str(params)}:{raw_rows}"
         return hashlib.md5(content.encode()).hexdigest()
     
     def _is_cache_valid(self, cache_entry: Dict[str, Any], ttl: int) -> bool:
@@ -80,14 +84,14 @@ class DatabaseConnection:
             options = QueryOptions()
             
         # Check cache first
-        if settings.enable_caching and options.cacheable:
-            cache_key = self._generate_cache_key(query, params)
-            if cache_key in self.cache:
-                cache_entry = self.cache[cache_key]
-                if self._is_cache_valid(cache_entry, options.ttl):
-                    return cache_entry["data"]
-                else:
-                    del self.cache[cache_key]
+        use_cache = settings.enable_caching and options.cacheable
+        if use_cache:
+            cache_key = self._generate_cache_key(query, params, options.raw_rows)
+            cache_entry = self.cache.pop(cache_key, None)
+            if cache_entry is not None and self._is_cache_valid(cache_entry, options.ttl):
+                # Re-insert so entries stay in least recently used order
+                self.cache[cache_key] = cache_entry
+                return cache_entry["data"]
         
         try:
             # Ensure connection
@@ -101,16 +105,16 @@ class DatabaseConnection:
                 result = self.connection.execute(query)
                 
             # Fetch and format results
-            rows = result.fetchall()
             columns = [desc[0] for desc in result.description] if result.description else []
             
-            formatted_rows = []
-            for row in rows:
-                row_dict = {}
-                for i, value in enumerate(row):
-                    if i < len(columns):
-                        row_dict[columns[i]] = value
-                formatted_rows.append(row_dict)
+            if options.raw_rows:
+                formatted_rows = result.fetchall()
+            else:
+                # Convert batch by batch so the full tuple result is never held
+                # alongside the dict rows built from it
+                formatted_rows = []
+                while batch := result.fetchmany(FETCH_BATCH_SIZE):
+                    formatted_rows.extend(dict(zip(columns, row)) for row in batch)
             
             query_result = {
                 "rows": formatted_rows,
@@ -118,9 +122,10 @@ class DatabaseConnection:
                 "row_count": len(formatted_rows)
             }
             
-            # Cache result if enabled
-            if settings.enable_caching and options.cacheable:
-                cache_key = self._generate_cache_key(query, params)
+            # Cache result if enabled, evicting the least recently used entry when full
+            if use_cache:
+                if len(self.cache) >= settings.query_cache_maxsize:
+                    del self.cache[next(iter(self.cache))]
                 self.cache[cache_key] = {
                     "data": query_result,
                     "timestamp": int(time.time() * 1000)
@@ -143,15 +148,67 @@ class DatabaseConnection:
             self.connection = None
             self._initialized = False
 
+class ResponseCache:
+    """In-process TTL and LRU cache for handler responses, keyed by request arguments"""
+
+    def __init__(self, maxsize: int = settings.response_cache_maxsize, ttl: int = settings.response_cache_ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries: Dict[Hashable, Dict[str, Any]] = {}
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached response, or None if missing or expired"""
+        if not settings.enable_caching:
+            return None
+        cache_entry = self.entries.get(key)
+        if cache_entry is None:
+            return None
+        current_time = int(time.time() * 1000)
+        if (current_time - cache_entry["timestamp"]) < self.ttl:
+            # Re-insert so entries stay in least recently used order
+            self.entries[key] = self.entries.pop(key)
+            return cache_entry["data"]
+        del self.entries[key]
+        return None
+
+    def set(self, key: Hashable, data: Any):
+        """Store a response, evicting the least recently used entry when full"""
+        if not settings.enable_caching:
+            return
+        if self.entries.pop(key, None) is None and len(self.entries) >= self.maxsize:
+            del self.entries[next(iter(self.entries))]
+        self.entries[key] = {
+            "data": data,
+            "timestamp": int(time.time() * 1000)
+        }
+
+    def clear(self):
+        """Drop all cached responses"""
+        self.entries.clear()
+
 # Global database instance
 db_instance = DatabaseConnection()
 
+# Global handler response cache
+response_cache = ResponseCache()
+
+# Short-lived cache of lookups that found no data, so repeated requests for
+# unknown ingredients skip the database entirely
+negative_cache = ResponseCache(ttl=settings.negative_cache_ttl)
+
 async def get_db_connection():
     """Get database connection instance"""
     if not db_instance._initialized:
         await db_instance.connect()
     return db_instance
 
+async def warm_db_connection(tables: Iterable[str]):
+    """Connect and read one row from each table so their metadata is cached before the first request"""
+    db = await get_db_connection()
+    await db.execute_query("SELECT 1")
+    for table in tables:
+        await db.execute_query(f"SELECT 1 FROM {table} LIMIT 1")
+
 async def execute_query(
     query: str, 
     params: List[Any] = None, 
@@ -161,6 +218,23 @@ async def execute_query(
     db = await get_db_connection()
     return await db.execute_query(query, params, options)
 
+async def fetch(query: str, *args: Any) -> List[tuple]:
+    """Run a query with positional $n parameters and return cached rows as tuples in SELECT order"""
+    db = await get_db_connection()
+    result = await db.execute_query(
+        query,
+        list(args),
+        QueryOptions(cacheable=True, raw_rows=True)
+    )
+    return result["rows"]
+
 async def close_db_connection():
     """Close database connection"""
-    await db_instance.close()
\ No newline at end of file
+    await db_instance.close()
+
+def clear_caches():
+    """Clear the handler response caches and the query result cache"""
+    response_cache.clear()
+    negative_cache.clear()
+    db_instance.cache.clear()
+    db_instance.cache_generation += 1
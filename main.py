@@ -1,8 +1,13 @@
 # main.py
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from config import settings
 from contextlib import asynccontextmanager
+from typing import Optional
+import hmac
+import logging
+import logging.handlers
+import queue
 
 # Rate limiting imports
 from slowapi import Limiter, _rate_limit_exceeded_handler
@@ -25,9 +30,8 @@ from routers.applications_router import router as applications_router
 from routers.pairings_router import router as pairings_router
 
 from routers.consumer_insights_attributes_router import router as consumer_insights_attributes_router
-# from routers.consumer_insights_flavor_router import router as consumer_insights_flavor_router
 
-from database.connection import close_db_connection, get_db_connection
+from database.connection import clear_caches, close_db_connection, warm_db_connection
 
 # Initialize rate limiter with global default
 limiter = Limiter(
@@ -38,15 +42,33 @@ limiter = Limiter(
     ]  # Global limits for ALL endpoints
 )
 
+# Tables read by the hot endpoints; touched at startup so the first request does
+# not pay for loading their metadata
+WARM_UP_TABLES = (
+    "ingredient_details", "category_year_totals", "cuisine_year_totals", "ingredient_names", "ingredient_category_yearly",
+    "ingredient_attribute"
+)
+
+def start_log_listener() -> logging.handlers.QueueListener:
+    """Route root log records through a queue so request handlers never block on log I/O"""
+    root_logger = logging.getLogger()
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, *root_logger.handlers, respect_handler_level=True)
+    root_logger.handlers = [logging.handlers.QueueHandler(log_queue)]
+    listener.start()
+    return listener
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    log_listener = start_log_listener()
     # Startup - pre-warm database connection
     print("Starting up FlavorLens API...")
-    await get_db_connection()  # Establish connection at startup
+    await warm_db_connection(WARM_UP_TABLES)  # Establish connection and touch hot tables at startup
     yield
     # Shutdown
     print("Shutting down FlavorLens API...")
     await close_db_connection()
+    log_listener.stop()
 
 app = FastAPI(
     title="FlavorLens API",
@@ -89,7 +111,6 @@ app.include_router(dish_router, prefix="/api", tags=["dish"])
 app.include_router(applications_router, prefix="/api", tags=["applications"])
 app.include_router(pairings_router, prefix="/api", tags=["pairings"])
 app.include_router(consumer_insights_attributes_router, prefix="/api", tags=["consumer-insights-attributes"])
-# app.include_router(consumer_insights_flavor_router, prefix="/api", tags=["consumer-insights-flavor"])
 
 # Apply rate limiting to root endpoints
 @app.get("/")
@@ -100,6 +121,16 @@ async def root():
 async def health_check():
     return {"status": "API is working"}
 
+@app.post("/cache/clear")
+async def clear_cache(x_admin_token: Optional[str] = Header(None)):
+    # Admin only: flushing every cache sends all later requests back to MotherDuck
+    if not settings.admin_token or not x_admin_token or not hmac.compare_digest(
+        x_admin_token.encode(), settings.admin_token.encode()
+    ):
+        raise HTTPException(status_code=403, detail="Admin token required")
+    clear_caches()
+    return {"status": "Cache cleared"}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -107,5 +138,7 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=8000,
         reload=True,
+        loop="uvloop",
+        http="httptools",
         log_level="info"
     )
\ No newline at end of file
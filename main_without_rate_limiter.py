@@ -22,7 +22,6 @@ from routers.applications_router import router as applications_router
 from routers.pairings_router import router as pairings_router
 
 from routers.consumer_insights_attributes_router import router as consumer_insights_attributes_router
-# from routers.consumer_insights_flavor_router import router as consumer_insights_flavor_router
 
 
 
@@ -75,7 +74,6 @@ app.include_router(dish_router, prefix="/api", tags=["dish"])
 app.include_router(applications_router, prefix="/api", tags=["applications"])
 app.include_router(pairings_router, prefix="/api", tags=["pairings"])
 app.include_router(consumer_insights_attributes_router, prefix="/api", tags=["consumer-insights-attributes"])
-# app.include_router(consumer_insights_flavor_router, prefix="/api", tags=["consumer-insights-flavor"])
 
 
 
@@ -96,5 +94,7 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=8000,
         reload=True,
+        loop="uvloop",
+        http="httptools",
         log_level="info"
     )
\ No newline at end of file
@@ -1,5 +1,6 @@
 # routers/category_router.py
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import ORJSONResponse
 from database.connection import execute_query, QueryOptions
 from pydantic import BaseModel
 from typing import List, Optional
@@ -29,146 +30,187 @@ class CategoryTrendData(BaseModel):
     years: List[int]
     categories: List[CategoryTrend]
 
+# Query texts are fixed so only the bound ingredient pattern ($1) varies between
+# requests. Ingredient counts come from the ingredient_category_yearly roll-up,
+# matched on the lowercased name, instead of scanning ingredient_details
+CATEGORY_DISTRIBUTION_QUERY = """
+WITH ingredient_counts AS (
+    SELECT 
+        general_category,
+        year,
+        SUM(row_count) AS count
+    FROM ingredient_category_yearly
+    WHERE ingredient_name_lower LIKE $1
+    GROUP BY general_category, year
+),
+pivoted AS (
+    SELECT
+        general_category,
+        SUM(CASE WHEN year = 2023 THEN count ELSE 0 END) AS count_2023,
+        SUM(CASE WHEN year = 2024 THEN count ELSE 0 END) AS count_2024
+    FROM ingredient_counts
+    GROUP BY general_category
+),
+total AS (
+    SELECT SUM(count_2024) AS total_2024
+    FROM pivoted
+)
+SELECT 
+    p.general_category AS name,
+    p.count_2024 AS dish_count,
+    ROUND(p.count_2024 * 100.0 / NULLIF(t.total_2024, 0), 2) AS value,
+    p.count_2023,
+    ROUND(
+        CASE 
+            WHEN p.count_2023 = 0 THEN NULL
+            ELSE ((p.count_2024 - p.count_2023) * 100.0 / p.count_2023)
+        END,
+        2
+    ) AS yoy_growth_percentage
+FROM pivoted p, total t
+WHERE p.general_category IS NOT NULL
+ORDER BY dish_count DESC;
+"""
+
+CATEGORY_PENETRATION_QUERY = """
+WITH ingredient_counts AS (
+    -- Single scan of the ingredient's rows for both the penetration numerator
+    -- and the per-year growth counts
+    SELECT 
+        general_category,
+        SUM(row_count) AS ingredient_count,
+        COALESCE(SUM(row_count) FILTER (WHERE year = 2024), 0) AS count_2024,
+        COALESCE(SUM(row_count) FILTER (WHERE year = 2023), 0) AS count_2023
+    FROM ingredient_category_yearly
+    WHERE ingredient_name_lower LIKE $1
+        AND general_category IS NOT NULL
+    GROUP BY general_category
+)
+SELECT 
+    ic.general_category AS name,
+    ROUND((ic.ingredient_count * 100.0 / NULLIF(ct.total_count, 0)), 1) AS penetration,
+    CASE
+        WHEN ic.count_2023 = 0 AND ic.count_2024 > 0 THEN 50.0
+        WHEN ic.count_2023 = 0 THEN 0.0
+        ELSE ROUND((ic.count_2024 - ic.count_2023) * 100.0 / NULLIF(ic.count_2023, 0), 1)
+    END AS growth,
+    CASE
+        WHEN ic.count_2023 = 0 AND ic.count_2024 > 0 THEN 'Hot'
+        WHEN ic.count_2023 = 0 THEN 'New'
+        WHEN ic.count_2024 > ic.count_2023 * 1.25 THEN 'Hot'
+        WHEN ic.count_2024 > ic.count_2023 * 1.1 THEN 'Rising'
+        WHEN ic.count_2024 >= ic.count_2023 * 0.9 THEN 'Stable'
+        ELSE 'Declining'
+    END AS status
+FROM ingredient_counts ic
+JOIN category_totals ct ON ic.general_category = ct.general_category
+ORDER BY penetration DESC
+LIMIT 10;
+"""
+
+YEARS_QUERY = """
+SELECT DISTINCT year
+FROM ingredient_details
+WHERE year >= 2018
+    AND year <= EXTRACT(YEAR FROM CURRENT_DATE)
+ORDER BY year ASC
+LIMIT 7;
+"""
+
+CATEGORY_TRENDS_QUERY = """
+WITH yearly_category_totals AS (
+    SELECT 
+        year,
+        COALESCE(general_category, 'Other') AS category,
+        COUNT(DISTINCT dish_id) AS total_dishes
+    FROM ingredient_details
+    WHERE year >= 2018
+        AND year <= EXTRACT(YEAR FROM CURRENT_DATE)
+        AND general_category IS NOT NULL
+    GROUP BY year, general_category
+),
+ingredient_dishes AS (
+    SELECT 
+        year,
+        general_category,
+        UNNEST(dish_ids) AS dish_id
+    FROM ingredient_category_yearly
+    WHERE ingredient_name_lower LIKE $1
+        AND year >= 2018
+        AND year <= EXTRACT(YEAR FROM CURRENT_DATE)
+        AND general_category IS NOT NULL
+),
+yearly_category_ingredient AS (
+    SELECT 
+        year,
+        general_category AS category,
+        COUNT(DISTINCT dish_id) AS ingredient_dishes
+    FROM ingredient_dishes
+    GROUP BY year, general_category
+)
+SELECT 
+    yct.year,
+    yct.category AS name,
+    ROUND(
+        COALESCE(yci.ingredient_dishes, 0) * 100.0 / NULLIF(yct.total_dishes, 0), 
+        2
+    ) AS adoption_percentage
+FROM yearly_category_totals yct
+LEFT JOIN yearly_category_ingredient yci 
+    ON yct.year = yci.year AND yct.category = yci.category
+ORDER BY yct.year ASC, adoption_percentage DESC;
+"""
+
 router = APIRouter()
 
-@router.get("/category/distribution", response_model=List[CategoryDistribution])
+@router.get("/category/distribution", response_model=List[CategoryDistribution], response_class=ORJSONResponse)
 async def get_category_distribution(ingredient: str = Query(..., description="Ingredient name")):
     try:
-        ingredient_pattern = f"'%{ingredient}%'"
-        
-        category_distribution_query = f"""
-        WITH ingredient_counts AS (
-            SELECT 
-                general_category,
-                year,
-                COUNT(*) AS count
-            FROM ingredient_details
-            WHERE ingredient_name ILIKE {ingredient_pattern}
-            GROUP BY general_category, year
-        ),
-        pivoted AS (
-            SELECT
-                general_category,
-                SUM(CASE WHEN year = 2023 THEN count ELSE 0 END) AS count_2023,
-                SUM(CASE WHEN year = 2024 THEN count ELSE 0 END) AS count_2024
-            FROM ingredient_counts
-            GROUP BY general_category
-        ),
-        total AS (
-            SELECT SUM(count_2024) AS total_2024
-            FROM pivoted
-        )
-        SELECT 
-            p.general_category AS name,
-            p.count_2024 AS dish_count,
-            ROUND(p.count_2024 * 100.0 / NULLIF(t.total_2024, 0), 2) AS value,
-            p.count_2023,
-            ROUND(
-                CASE 
-                    WHEN p.count_2023 = 0 THEN NULL
-                    ELSE ((p.count_2024 - p.count_2023) * 100.0 / p.count_2023)
-                END,
-                2
-            ) AS yoy_growth_percentage
-        FROM pivoted p, total t
-        WHERE p.general_category IS NOT NULL
-        ORDER BY dish_count DESC;
-        """
+        ingredient_pattern = f"%{ingredient.lower()}%"
         
         result = await execute_query(
-            category_distribution_query,
+            CATEGORY_DISTRIBUTION_QUERY,
+            [ingredient_pattern],
             options=QueryOptions(cacheable=True, ttl=3600000)
         )
         
-        if result["rows"]:
-            categories = []
-            for row in result["rows"]:
-                categories.append(CategoryDistribution(
-                    name=str(row["name"]),
-                    value=float(row["value"]) if row["value"] is not None else 0.0,
-                    dish_count=int(row["dish_count"]),
-                    count_2023=int(row["count_2023"]) if row["count_2023"] is not None else 0,
-                    yoy_growth_percentage=float(row["yoy_growth_percentage"]) if row["yoy_growth_percentage"] is not None else None
-                ))
-            
-            return categories
-        
-        return []
+        # Rows come from our own query with the column types already fixed, so
+        # skip per-row validation; an empty result yields an empty list
+        return [
+            CategoryDistribution.model_construct(
+                name=row["name"],
+                value=row["value"] if row["value"] is not None else 0.0,
+                dish_count=row["dish_count"],
+                count_2023=row["count_2023"] if row["count_2023"] is not None else 0,
+                yoy_growth_percentage=row["yoy_growth_percentage"]
+            )
+            for row in result["rows"]
+        ]
         
     except Exception as e:
         print(f"Database query error: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch category distribution data")
 
-@router.get("/category/penetration", response_model=CategoryPenetrationData)
+@router.get("/category/penetration", response_model=CategoryPenetrationData, response_class=ORJSONResponse)
 async def get_category_penetration(ingredient: str = Query(..., description="Ingredient name")):
     try:
-        ingredient_pattern = f"'%{ingredient}%'"
-        
-        category_penetration_query = f"""
-        WITH category_counts AS (
-            SELECT 
-                general_category,
-                COUNT(*) AS ingredient_count
-            FROM ingredient_details
-            WHERE ingredient_name ILIKE {ingredient_pattern}
-                AND general_category IS NOT NULL
-            GROUP BY general_category
-        ),
-        total_counts AS (
-            SELECT 
-                general_category,
-                COUNT(*) AS total_count
-            FROM ingredient_details
-            WHERE general_category IS NOT NULL
-            GROUP BY general_category
-        ),
-        growth_data AS (
-            SELECT 
-                general_category,
-                COUNT(CASE WHEN year = 2024 THEN 1 ELSE NULL END) AS count_2024,
-                COUNT(CASE WHEN year = 2023 THEN 1 ELSE NULL END) AS count_2023
-            FROM ingredient_details
-            WHERE ingredient_name ILIKE {ingredient_pattern}
-                AND general_category IS NOT NULL
-            GROUP BY general_category
-        )
-        SELECT 
-            cc.general_category AS name,
-            ROUND((cc.ingredient_count * 100.0 / NULLIF(tc.total_count, 0)), 1) AS penetration,
-            CASE
-                WHEN gd.count_2023 = 0 AND gd.count_2024 > 0 THEN 50.0
-                WHEN gd.count_2023 = 0 THEN 0.0
-                ELSE ROUND((gd.count_2024 - gd.count_2023) * 100.0 / NULLIF(gd.count_2023, 0), 1)
-            END AS growth,
-            CASE
-                WHEN gd.count_2023 = 0 AND gd.count_2024 > 0 THEN 'Hot'
-                WHEN gd.count_2023 = 0 THEN 'New'
-                WHEN gd.count_2024 > gd.count_2023 * 1.25 THEN 'Hot'
-                WHEN gd.count_2024 > gd.count_2023 * 1.1 THEN 'Rising'
-                WHEN gd.count_2024 >= gd.count_2023 * 0.9 THEN 'Stable'
-                ELSE 'Declining'
-            END AS status
-        FROM category_counts cc
-        JOIN total_counts tc ON cc.general_category = tc.general_category
-        LEFT JOIN growth_data gd ON cc.general_category = gd.general_category
-        ORDER BY penetration DESC
-        LIMIT 10;
-        """
+        ingredient_pattern = f"%{ingredient.lower()}%"
         
         result = await execute_query(
-            category_penetration_query,
+            CATEGORY_PENETRATION_QUERY,
+            [ingredient_pattern],
             options=QueryOptions(cacheable=True, ttl=3600000)
         )
         
-        categories = []
-        if result["rows"]:
-            for row in result["rows"]:
-                categories.append(CategoryPenetration(
-                    name=str(row["name"]),
-                    penetration=float(row["penetration"]) if row["penetration"] is not None else 0.0,
-                    growth=float(row["growth"]) if row["growth"] is not None else 0.0,
-                    status=str(row["status"])
-                ))
+        categories = [
+            CategoryPenetration.model_construct(
+                name=row["name"],
+                penetration=row["penetration"] if row["penetration"] is not None else 0.0,
+                growth=row["growth"] if row["growth"] is not None else 0.0,
+                status=row["status"]
+            )
+            for row in result["rows"]
+        ]
         
         return CategoryPenetrationData(categories=categories)
         
@@ -176,61 +218,15 @@ async def get_category_penetration(ingredient: str = Query(..., description="Ing
         print(f"Database query error: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch category penetration data")
 
-@router.get("/category/trends", response_model=CategoryTrendData)
+@router.get("/category/trends", response_model=CategoryTrendData, response_class=ORJSONResponse)
 async def get_category_trends(ingredient: str = Query(..., description="Ingredient name")):
     try:
-        ingredient_pattern = f"'%{ingredient}%'"
-        
-        years_query = f"""
-        SELECT DISTINCT year
-        FROM ingredient_details
-        WHERE year >= 2018
-            AND year <= EXTRACT(YEAR FROM CURRENT_DATE)
-        ORDER BY year ASC
-        LIMIT 7;
-        """
-        
-        category_trends_query = f"""
-        WITH yearly_category_totals AS (
-            SELECT 
-                year,
-                COALESCE(general_category, 'Other') AS category,
-                COUNT(DISTINCT dish_id) AS total_dishes
-            FROM ingredient_details
-            WHERE year >= 2018
-                AND year <= EXTRACT(YEAR FROM CURRENT_DATE)
-                AND general_category IS NOT NULL
-            GROUP BY year, general_category
-        ),
-        yearly_category_ingredient AS (
-            SELECT 
-                year,
-                COALESCE(general_category, 'Other') AS category,
-                COUNT(DISTINCT dish_id) AS ingredient_dishes
-            FROM ingredient_details
-            WHERE ingredient_name ILIKE {ingredient_pattern}
-                AND year >= 2018
-                AND year <= EXTRACT(YEAR FROM CURRENT_DATE)
-                AND general_category IS NOT NULL
-            GROUP BY year, general_category
-        )
-        SELECT 
-            yct.year,
-            yct.category AS name,
-            ROUND(
-                COALESCE(yci.ingredient_dishes, 0) * 100.0 / NULLIF(yct.total_dishes, 0), 
-                2
-            ) AS adoption_percentage
-        FROM yearly_category_totals yct
-        LEFT JOIN yearly_category_ingredient yci 
-            ON yct.year = yci.year AND yct.category = yci.category
-        ORDER BY yct.year ASC, adoption_percentage DESC;
-        """
+        ingredient_pattern = f"%{ingredient.lower()}%"
         
         # Execute queries
         years_result, trends_result = await asyncio.gather(
-            execute_query(years_query, options=QueryOptions(cacheable=True, ttl=3600000)),
-            execute_query(category_trends_query, options=QueryOptions(cacheable=True, ttl=3600000))
+            execute_query(YEARS_QUERY, options=QueryOptions(cacheable=True, ttl=3600000)),
+            execute_query(CATEGORY_TRENDS_QUERY, [ingredient_pattern], options=QueryOptions(cacheable=True, ttl=3600000))
         )
         
         if years_result["rows"] and trends_result["rows"]:
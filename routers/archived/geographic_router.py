@@ -3,6 +3,7 @@
 # from database.connection import execute_query, QueryOptions
 # from pydantic import BaseModel
 # from typing import Dict, List
+# from types import MappingProxyType
 
 # class GeographicRegion(BaseModel):
 #     country: str
@@ -19,6 +20,22 @@
 #     regionalInsights: List[RegionalInsight]
 
 
+# # Country to region mapping for regional insights
+# REGION_MAPPING = MappingProxyType({
+#     "USA": "North America", "United States": "North America", "Canada": "North America", "Mexico": "North America",
+#     "UK": "Europe", "United Kingdom": "Europe", "France": "Europe", "Germany": "Europe", "Italy": "Europe", 
+#     "Spain": "Europe", "Netherlands": "Europe", "Belgium": "Europe", "Switzerland": "Europe", "Austria": "Europe",
+#     "Sweden": "Europe", "Norway": "Europe", "Denmark": "Europe", "Finland": "Europe", "Portugal": "Europe",
+#     "Japan": "Asia", "China": "Asia", "Korea": "Asia", "South Korea": "Asia", "Thailand": "Asia", 
+#     "Vietnam": "Asia", "India": "Asia", "Indonesia": "Asia", "Malaysia": "Asia", "Singapore": "Asia",
+#     "Philippines": "Asia", "Taiwan": "Asia", "Hong Kong": "Asia",
+#     "Brazil": "Latin America", "Argentina": "Latin America", "Chile": "Latin America", "Colombia": "Latin America",
+#     "Peru": "Latin America", "Venezuela": "Latin America", "Ecuador": "Latin America", "Uruguay": "Latin America",
+#     "Australia": "Oceania", "New Zealand": "Oceania",
+#     "South Africa": "Africa", "Nigeria": "Africa", "Kenya": "Africa", "Egypt": "Africa", "Morocco": "Africa",
+#     "Ghana": "Africa", "Ethiopia": "Africa"
+# })
+
 # router = APIRouter()
 
 # @router.get("/geographic-distribution", response_model=GeographicData)
@@ -103,57 +120,38 @@
 #         if not result["rows"]:
 #             return GeographicData(regions=[], regionalInsights=[])
         
-#         # Region mapping for insights
-#         region_mapping = {
-#             "USA": "North America", "United States": "North America", "Canada": "North America", "Mexico": "North America",
-#             "UK": "Europe", "United Kingdom": "Europe", "France": "Europe", "Germany": "Europe", "Italy": "Europe", 
-#             "Spain": "Europe", "Netherlands": "Europe", "Belgium": "Europe", "Switzerland": "Europe", "Austria": "Europe",
-#             "Sweden": "Europe", "Norway": "Europe", "Denmark": "Europe", "Finland": "Europe", "Portugal": "Europe",
-#             "Japan": "Asia", "China": "Asia", "Korea": "Asia", "South Korea": "Asia", "Thailand": "Asia", 
-#             "Vietnam": "Asia", "India": "Asia", "Indonesia": "Asia", "Malaysia": "Asia", "Singapore": "Asia",
-#             "Philippines": "Asia", "Taiwan": "Asia", "Hong Kong": "Asia",
-#             "Brazil": "Latin America", "Argentina": "Latin America", "Chile": "Latin America", "Colombia": "Latin America",
-#             "Peru": "Latin America", "Venezuela": "Latin America", "Ecuador": "Latin America", "Uruguay": "Latin America",
-#             "Australia": "Oceania", "New Zealand": "Oceania",
-#             "South Africa": "Africa", "Nigeria": "Africa", "Kenya": "Africa", "Egypt": "Africa", "Morocco": "Africa",
-#             "Ghana": "Africa", "Ethiopia": "Africa"
-#         }
-        
-#         # Process regions
-#         regions = [
-#             GeographicRegion(
-#                 country=str(row["country"]),
-#                 adoption=float(row["adoption"]) if row["adoption"] is not None else 0.0,
-#                 growth=float(row["growth"]) if row["growth"] is not None else 0.0
-#             ) for row in result["rows"]
-#         ]
-        
-#         # Calculate regional insights
-#         regional_data: Dict[str, Dict] = {}
+#         # Process regions and accumulate regional totals in a single pass,
+#         # parsing each row's values once
+#         regions = []
+#         regional_data: Dict[str, List[float]] = {}
 #         for row in result["rows"]:
-#             region = region_mapping.get(row["country"], "Other")
-#             if region not in regional_data:
-#                 regional_data[region] = {"adoption": 0, "growth": 0, "count": 0}
-            
 #             adoption_val = float(row["adoption"]) if row["adoption"] is not None else 0.0
 #             growth_val = float(row["growth"]) if row["growth"] is not None else 0.0
             
-#             regional_data[region]["adoption"] += adoption_val
-#             regional_data[region]["growth"] += growth_val
-#             regional_data[region]["count"] += 1
+#             regions.append(GeographicRegion(
+#                 country=row["country"],
+#                 adoption=adoption_val,
+#                 growth=growth_val
+#             ))
+            
+#             totals = regional_data.setdefault(REGION_MAPPING.get(row["country"], "Other"), [0.0, 0.0, 0])
+#             totals[0] += adoption_val
+#             totals[1] += growth_val
+#             totals[2] += 1
         
-#         # Calculate averages for regional insights
-#         regional_insights = []
-#         for name, data in regional_data.items():
-#             if data["count"] > 0:  # Avoid division by zero
-#                 regional_insights.append(RegionalInsight(
+#         # Calculate averages for regional insights, sorted by adoption
+#         regional_insights = sorted(
+#             (
+#                 RegionalInsight(
 #                     name=name,
-#                     adoption=round((data["adoption"] / data["count"]), 1),
-#                     growth=round((data["growth"] / data["count"]), 1)
-#                 ))
-        
-#         # Sort by adoption
-#         regional_insights.sort(key=lambda x: x.adoption, reverse=True)
+#                     adoption=round(adoption / count, 1),
+#                     growth=round(growth / count, 1)
+#                 )
+#                 for name, (adoption, growth, count) in regional_data.items()
+#             ),
+#             key=lambda x: x.adoption,
+#             reverse=True
+#         )
         
 #         return GeographicData(
 #             regions=regions,
@@ -173,6 +171,7 @@ from database.connection import execute_query, QueryOptions
 from pydantic import BaseModel
 from typing import List, Optional
 import asyncio
+import heapq
 
 class GeographicDistribution(BaseModel):
     name: str
@@ -248,23 +247,20 @@ async def get_geographic_distribution(ingredient: str = Query(..., description="
         
         result = await execute_query(
             geographic_distribution_query,
-            options=QueryOptions(cacheable=True, ttl=3600000)
+            options=QueryOptions(cacheable=True, ttl=3600000, raw_rows=True)
         )
         
-        if result["rows"]:
-            countries = []
-            for row in result["rows"]:
-                countries.append(GeographicDistribution(
-                    name=str(row["name"]),
-                    value=float(row["value"]) if row["value"] is not None else 0.0,
-                    dish_count=int(row["dish_count"]),
-                    count_2023=int(row["count_2023"]) if row["count_2023"] is not None else 0,
-                    yoy_growth_percentage=float(row["yoy_growth_percentage"]) if row["yoy_growth_percentage"] is not None else None
-                ))
-            
-            return countries
-        
-        return []
+        # Rows are tuples in SELECT column order
+        return [
+            GeographicDistribution.model_construct(
+                name=name,
+                value=float(value) if value is not None else 0.0,
+                dish_count=int(dish_count),
+                count_2023=int(count_2023) if count_2023 is not None else 0,
+                yoy_growth_percentage=float(yoy_growth_percentage) if yoy_growth_percentage is not None else None
+            )
+            for name, dish_count, value, count_2023, yoy_growth_percentage in result["rows"]
+        ]
         
     except Exception as e:
         print(f"Database query error: {e}")
@@ -331,18 +327,19 @@ async def get_geographic_penetration(ingredient: str = Query(..., description="I
         
         result = await execute_query(
             geographic_penetration_query,
-            options=QueryOptions(cacheable=True, ttl=3600000)
+            options=QueryOptions(cacheable=True, ttl=3600000, raw_rows=True)
         )
         
-        countries = []
-        if result["rows"]:
-            for row in result["rows"]:
-                countries.append(GeographicPenetration(
-                    name=str(row["name"]),
-                    penetration=float(row["penetration"]) if row["penetration"] is not None else 0.0,
-                    growth=float(row["growth"]) if row["growth"] is not None else 0.0,
-                    status=str(row["status"])
-                ))
+        # Rows are tuples in SELECT column order
+        countries = [
+            GeographicPenetration.model_construct(
+                name=name,
+                penetration=float(penetration) if penetration is not None else 0.0,
+                growth=float(growth) if growth is not None else 0.0,
+                status=status
+            )
+            for name, penetration, growth, status in result["rows"]
+        ]
         
         return GeographicPenetrationData(countries=countries)
         
@@ -405,19 +402,18 @@ async def get_geographic_trends(ingredient: str = Query(..., description="Ingred
         
         # Execute queries
         years_result, trends_result = await asyncio.gather(
-            execute_query(years_query, options=QueryOptions(cacheable=True, ttl=3600000)),
-            execute_query(geographic_trends_query, options=QueryOptions(cacheable=True, ttl=3600000))
+            execute_query(years_query, options=QueryOptions(cacheable=True, ttl=3600000, raw_rows=True)),
+            execute_query(geographic_trends_query, options=QueryOptions(cacheable=True, ttl=3600000, raw_rows=True))
         )
         
         if years_result["rows"] and trends_result["rows"]:
-            years = [int(row["year"]) for row in years_result["rows"]]
+            years = [int(year) for (year,) in years_result["rows"]]
             
             # Process trend data by country
             country_map = {}
             
-            # Group data by country
-            for row in trends_result["rows"]:
-                country_name = str(row["name"])
+            # Group data by country; rows are (year, name, adoption_percentage) tuples
+            for year, country_name, adoption_percentage in trends_result["rows"]:
                 if country_name not in country_map:
                     country_map[country_name] = {
                         "name": country_name,
@@ -425,23 +421,21 @@ async def get_geographic_trends(ingredient: str = Query(..., description="Ingred
                     }
                 
                 # Find the index for this year
-                year_index = years.index(int(row["year"])) if int(row["year"]) in years else -1
+                year_index = years.index(int(year)) if int(year) in years else -1
                 if year_index >= 0:
-                    country_map[country_name]["adoption_percentages"][year_index] = float(row["adoption_percentage"] or 0.0)
-            
-            # Convert to list and take top 5 countries by total adoption
-            sorted_countries = sorted(
-                country_map.values(),
-                key=lambda x: sum(x["adoption_percentages"]),
-                reverse=True
-            )[:5]
+                    country_map[country_name]["adoption_percentages"][year_index] = float(adoption_percentage or 0.0)
             
+            # Take top 5 countries by total adoption without sorting the full map
             countries = [
-                CountryTrend(
+                CountryTrend.model_construct(
                     name=country["name"],
                     adoption_percentages=country["adoption_percentages"]
                 )
-                for country in sorted_countries
+                for country in heapq.nlargest(
+                    5,
+                    country_map.values(),
+                    key=lambda x: sum(x["adoption_percentages"])
+                )
             ]
             
             return GeographicTrendData(years=years, countries=countries)
@@ -2,7 +2,8 @@
 from fastapi import APIRouter, HTTPException, Query
 from database.connection import execute_query, QueryOptions
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import FrozenSet, List, Optional, Tuple
+import logging
 
 class SubcategoryDistribution(BaseModel):
     subcategory: str
@@ -17,53 +18,119 @@ class SubcategoryPenetration(BaseModel):
 class SubcategoryPenetrationData(BaseModel):
     subcategories: List[SubcategoryPenetration]
 
+class SubcategoryOverview(BaseModel):
+    distribution: List[SubcategoryDistribution]
+    penetration: SubcategoryPenetrationData
+
+# Query text is fixed so only the bound parameters vary between requests; a NULL
+# category pattern disables the category filter
+SUBCATEGORY_OVERVIEW_QUERY = """
+WITH base AS (
+    SELECT
+        specific_category,
+        dish_id,
+        year,
+        (ingredient_name ILIKE $1) AS matches
+    FROM ingredient_details
+    WHERE specific_category IS NOT NULL
+        AND specific_category != ''
+        AND year IN (2023, 2024)
+        AND ($2::VARCHAR IS NULL OR general_category ILIKE $2)
+),
+distribution AS (
+    SELECT
+        specific_category,
+        ROUND(COUNT(*) * 100.0 / SUM(COUNT(*)) OVER (), 2) AS percentage_of_total
+    FROM base
+    WHERE matches
+        AND year = 2024
+    GROUP BY specific_category
+),
+penetration_by_year AS (
+    SELECT
+        specific_category,
+        COUNT(DISTINCT dish_id) FILTER (WHERE matches AND year = 2024) AS ingredient_dishes_2024,
+        COUNT(DISTINCT dish_id) FILTER (WHERE year = 2024) AS total_dishes_2024,
+        COUNT(DISTINCT dish_id) FILTER (WHERE matches AND year = 2023) AS ingredient_dishes_2023,
+        COUNT(DISTINCT dish_id) FILTER (WHERE year = 2023) AS total_dishes_2023
+    FROM base
+    GROUP BY specific_category
+),
+penetration AS (
+    SELECT
+        specific_category,
+        ROUND(ingredient_dishes_2024 * 100.0 / NULLIF(total_dishes_2024, 0), 1) AS penetration_2024,
+        ROUND(ingredient_dishes_2023 * 100.0 / NULLIF(total_dishes_2023, 0), 1) AS penetration_2023
+    FROM penetration_by_year
+    WHERE ingredient_dishes_2024 > 0
+    ORDER BY penetration_2024 DESC
+    LIMIT 10
+)
+SELECT
+    'distribution' AS kind,
+    specific_category AS subcategory,
+    percentage_of_total AS value,
+    NULL AS growth,
+    NULL AS status
+FROM distribution
+UNION ALL
+SELECT
+    'penetration' AS kind,
+    specific_category AS subcategory,
+    penetration_2024 AS value,
+    ROUND(penetration_2024 - COALESCE(penetration_2023, 0), 1) AS growth,
+    CASE
+        WHEN penetration_2023 IS NULL OR penetration_2023 = 0 THEN 'emerging'
+        WHEN penetration_2024 > penetration_2023 * 1.1 THEN 'growing'
+        WHEN penetration_2024 < penetration_2023 * 0.9 THEN 'declining'
+        ELSE 'mature'
+    END AS status
+FROM penetration
+ORDER BY kind, value DESC;
+"""
+
+KNOWN_CATEGORIES_QUERY = """
+SELECT DISTINCT general_category
+FROM ingredient_details
+WHERE general_category IS NOT NULL;
+"""
+
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
+@router.get("/subcategory/overview", response_model=SubcategoryOverview)
+async def get_subcategory_overview(
+    ingredient: str = Query(..., description="Ingredient name"),
+    category: Optional[str] = Query(None, description="Filter by category")
+):
+    try:
+        distribution, penetration = await fetch_subcategory_overview(ingredient, category)
+
+        return SubcategoryOverview(
+            distribution=distribution,
+            penetration=SubcategoryPenetrationData(subcategories=penetration)
+        )
+
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Subcategory overview query failed")
+        raise HTTPException(status_code=500, detail="Failed to fetch subcategory overview data")
+
 @router.get("/subcategory/distribution", response_model=List[SubcategoryDistribution])
 async def get_subcategory_distribution(
     ingredient: str = Query(..., description="Ingredient name"),
     category: Optional[str] = Query(None, description="Filter by category")
 ):
     try:
-        ingredient_pattern = f"'%{ingredient}%'"
-        category_filter = f"AND general_category ILIKE '%{category}%'" if category else ""
-        
-        subcategory_distribution_query = f"""
-        SELECT 
-            specific_category AS subcategory,
-            ROUND(COUNT(*) * 100.0 / SUM(COUNT(*)) OVER (), 2) AS percentage_of_total
-        FROM ingredient_details
-        WHERE ingredient_name ILIKE {ingredient_pattern}
-            AND specific_category IS NOT NULL
-            AND specific_category != ''
-            AND year = 2024
-            {category_filter}
-        GROUP BY specific_category
-        ORDER BY percentage_of_total DESC;
-        """
-        
-        result = await execute_query(
-            subcategory_distribution_query,
-            options=QueryOptions(cacheable=True, ttl=3600000)
-        )
-        
-        print(f"Distribution query result: {result}")  # Debug log
-        
-        if result["rows"]:
-            subcategories = []
-            for row in result["rows"]:
-                subcategories.append(SubcategoryDistribution(
-                    subcategory=str(row["subcategory"]),
-                    percentage_of_total=float(row["percentage_of_total"]) if row["percentage_of_total"] is not None else 0.0
-                ))
-            
-            return subcategories
-        
-        return []
-        
-    except Exception as e:
-        print(f"Database query error: {e}")
-        print(f"Query was: {subcategory_distribution_query}")
+        distribution, _ = await fetch_subcategory_overview(ingredient, category)
+        return distribution
+
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Subcategory distribution query failed")
         raise HTTPException(status_code=500, detail="Failed to fetch subcategory distribution data")
 
 @router.get("/subcategory/penetration", response_model=SubcategoryPenetrationData)
@@ -72,77 +139,66 @@ async def get_subcategory_penetration(
     category: Optional[str] = Query(None, description="Filter by category")
 ):
     try:
-        ingredient_pattern = f"'%{ingredient}%'"
-        category_filter = f"AND general_category ILIKE '%{category}%'" if category else ""
-        
-        subcategory_penetration_query = f"""
-        WITH penetration_2024 AS (
-            SELECT 
-                specific_category,
-                COUNT(DISTINCT CASE WHEN ingredient_name ILIKE {ingredient_pattern} THEN dish_id END) AS ingredient_dishes,
-                COUNT(DISTINCT dish_id) AS total_dishes,
-                ROUND(
-                    COUNT(DISTINCT CASE WHEN ingredient_name ILIKE {ingredient_pattern} THEN dish_id END) * 100.0 / 
-                    NULLIF(COUNT(DISTINCT dish_id), 0), 1
-                ) AS penetration_2024
-            FROM ingredient_details
-            WHERE specific_category IS NOT NULL
-                AND specific_category != ''
-                AND year = 2024
-                {category_filter}
-            GROUP BY specific_category
-            HAVING COUNT(DISTINCT CASE WHEN ingredient_name ILIKE {ingredient_pattern} THEN dish_id END) > 0
-        ),
-        penetration_2023 AS (
-            SELECT 
-                specific_category,
-                ROUND(
-                    COUNT(DISTINCT CASE WHEN ingredient_name ILIKE {ingredient_pattern} THEN dish_id END) * 100.0 / 
-                    NULLIF(COUNT(DISTINCT dish_id), 0), 1
-                ) AS penetration_2023
-            FROM ingredient_details
-            WHERE specific_category IS NOT NULL
-                AND specific_category != ''
-                AND year = 2023
-                {category_filter}
-            GROUP BY specific_category
-        )
-        SELECT 
-            p24.specific_category AS subcategory,
-            p24.penetration_2024 AS penetration_within_category,
-            ROUND(p24.penetration_2024 - COALESCE(p23.penetration_2023, 0), 1) AS growth_in_penetration,
-            CASE
-                WHEN p23.penetration_2023 IS NULL OR p23.penetration_2023 = 0 THEN 'emerging'
-                WHEN p24.penetration_2024 > p23.penetration_2023 * 1.1 THEN 'growing'
-                WHEN p24.penetration_2024 < p23.penetration_2023 * 0.9 THEN 'declining'
-                ELSE 'mature'
-            END AS status
-        FROM penetration_2024 p24
-        LEFT JOIN penetration_2023 p23 ON p24.specific_category = p23.specific_category
-        ORDER BY penetration_within_category DESC
-        LIMIT 10;
-        """
-        
-        result = await execute_query(
-            subcategory_penetration_query,
-            options=QueryOptions(cacheable=True, ttl=3600000)
-        )
-        
-        print(f"Penetration query result: {result}")  # Debug log
-        
-        subcategories = []
-        if result["rows"]:
-            for row in result["rows"]:
-                subcategories.append(SubcategoryPenetration(
-                    subcategory=str(row["subcategory"]),
-                    penetration_within_category=float(row["penetration_within_category"]) if row["penetration_within_category"] is not None else 0.0,
-                    growth_in_penetration=float(row["growth_in_penetration"]) if row["growth_in_penetration"] is not None else 0.0,
-                    status=str(row["status"])
-                ))
-        
-        return SubcategoryPenetrationData(subcategories=subcategories)
-        
-    except Exception as e:
-        print(f"Database query error: {e}")
-        print(f"Query was: {subcategory_penetration_query}")
-        raise HTTPException(status_code=500, detail="Failed to fetch subcategory penetration data")
\ No newline at end of file
+        _, penetration = await fetch_subcategory_overview(ingredient, category)
+        return SubcategoryPenetrationData(subcategories=penetration)
+
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Subcategory penetration query failed")
+        raise HTTPException(status_code=500, detail="Failed to fetch subcategory penetration data")
+
+
+async def fetch_subcategory_overview(
+    ingredient: str,
+    category: Optional[str]
+) -> Tuple[List[SubcategoryDistribution], List[SubcategoryPenetration]]:
+    """Fetch distribution and penetration together in a single scan.
+
+    Both endpoints issue the identical query text, so whichever is requested
+    first populates the query cache for the other.
+    """
+
+    if category:
+        known_categories = await fetch_known_categories()
+        category_lower = category.lower()
+        if not any(category_lower in known for known in known_categories):
+            raise HTTPException(status_code=400, detail=f"Unknown category: {category}")
+
+    params = [f"%{ingredient}%", f"%{category}%" if category else None]
+
+    result = await execute_query(
+        SUBCATEGORY_OVERVIEW_QUERY,
+        params,
+        options=QueryOptions(cacheable=True, ttl=3600000)
+    )
+
+    distribution = []
+    penetration = []
+    for row in result["rows"]:
+        value = float(row["value"]) if row["value"] is not None else 0.0
+        if row["kind"] == "distribution":
+            distribution.append(SubcategoryDistribution(
+                subcategory=row["subcategory"],
+                percentage_of_total=value
+            ))
+        else:
+            penetration.append(SubcategoryPenetration(
+                subcategory=row["subcategory"],
+                penetration_within_category=value,
+                growth_in_penetration=float(row["growth"]) if row["growth"] is not None else 0.0,
+                status=row["status"]
+            ))
+
+    return distribution, penetration
+
+
+async def fetch_known_categories() -> FrozenSet[str]:
+    """Fetch the lowercased general categories used to validate the category filter"""
+
+    result = await execute_query(
+        KNOWN_CATEGORIES_QUERY,
+        options=QueryOptions(cacheable=True, ttl=3600000)
+    )
+
+    return frozenset(row["general_category"].lower() for row in result["rows"])
@@ -1,9 +1,9 @@
 # routers/subcategory_router.py
 from fastapi import APIRouter, HTTPException, Query
-from database.connection import execute_query, QueryOptions
+from database.connection import execute_query, QueryOptions, response_cache
 from pydantic import BaseModel
 from typing import List, Optional
-import asyncio
+import logging
 
 class SubcategoryDistribution(BaseModel):
     name: str
@@ -29,6 +29,160 @@ class SubcategoryTrendData(BaseModel):
     years: List[int]
     subcategories: List[SubcategoryTrend]
 
+# Query text is fixed; ingredient and category patterns are bound as $1 and $2,
+# with a NULL category disabling the category filter
+
+SUBCATEGORY_DISTRIBUTION_QUERY = """
+WITH ingredient_counts AS (
+    SELECT 
+        specific_category,
+        year,
+        COUNT(*) AS count
+    FROM ingredient_details
+    WHERE ingredient_name ILIKE $1
+        AND specific_category IS NOT NULL
+        AND specific_category != ''
+        AND ($2::VARCHAR IS NULL OR general_category ILIKE $2)
+    GROUP BY specific_category, year
+),
+pivoted AS (
+    SELECT
+        specific_category,
+        SUM(CASE WHEN year = 2023 THEN count ELSE 0 END) AS count_2023,
+        SUM(CASE WHEN year = 2024 THEN count ELSE 0 END) AS count_2024
+    FROM ingredient_counts
+    GROUP BY specific_category
+),
+total AS (
+    SELECT SUM(count_2024) AS total_2024
+    FROM pivoted
+)
+SELECT 
+    p.specific_category AS name,
+    p.count_2024 AS dish_count,
+    ROUND(p.count_2024 * 100.0 / NULLIF(t.total_2024, 0), 2) AS value,
+    p.count_2023,
+    ROUND(
+        CASE 
+            WHEN p.count_2023 = 0 THEN NULL
+            ELSE ((p.count_2024 - p.count_2023) * 100.0 / p.count_2023)
+        END,
+        2
+    ) AS yoy_growth_percentage
+FROM pivoted p, total t
+WHERE p.specific_category IS NOT NULL
+ORDER BY dish_count DESC;
+"""
+
+SUBCATEGORY_PENETRATION_QUERY = """
+WITH base AS (
+    SELECT 
+        specific_category,
+        year,
+        (ingredient_name ILIKE $1) AS matches
+    FROM ingredient_details
+    WHERE specific_category IS NOT NULL
+        AND specific_category != ''
+        AND ($2::VARCHAR IS NULL OR general_category ILIKE $2)
+),
+subcategory_counts AS (
+    SELECT 
+        specific_category,
+        COUNT(*) FILTER (WHERE matches) AS ingredient_count,
+        COUNT(*) AS total_count,
+        COUNT(*) FILTER (WHERE matches AND year = 2024) AS count_2024,
+        COUNT(*) FILTER (WHERE matches AND year = 2023) AS count_2023
+    FROM base
+    GROUP BY specific_category
+)
+SELECT 
+    specific_category AS name,
+    ROUND((ingredient_count * 100.0 / NULLIF(total_count, 0)), 1) AS penetration,
+    CASE
+        WHEN count_2023 = 0 AND count_2024 > 0 THEN 50.0
+        WHEN count_2023 = 0 THEN 0.0
+        ELSE ROUND((count_2024 - count_2023) * 100.0 / NULLIF(count_2023, 0), 1)
+    END AS growth,
+    CASE
+        WHEN count_2023 = 0 AND count_2024 > 0 THEN 'Hot'
+        WHEN count_2023 = 0 THEN 'New'
+        WHEN count_2024 > count_2023 * 1.25 THEN 'Hot'
+        WHEN count_2024 > count_2023 * 1.1 THEN 'Rising'
+        WHEN count_2024 >= count_2023 * 0.9 THEN 'Stable'
+        ELSE 'Declining'
+    END AS status
+FROM subcategory_counts
+WHERE ingredient_count > 0
+ORDER BY penetration DESC
+LIMIT 10;
+"""
+
+SUBCATEGORY_TRENDS_QUERY = """
+WITH yearly_subcategory_totals AS (
+    SELECT 
+        year,
+        specific_category,
+        COUNT(DISTINCT dish_id) AS total_dishes
+    FROM ingredient_details
+    WHERE year >= 2018
+        AND year <= EXTRACT(YEAR FROM CURRENT_DATE)
+        AND specific_category IS NOT NULL
+        AND specific_category != ''
+        AND ($2::VARCHAR IS NULL OR general_category ILIKE $2)
+    GROUP BY year, specific_category
+),
+yearly_subcategory_ingredient AS (
+    SELECT 
+        year,
+        specific_category,
+        COUNT(DISTINCT dish_id) AS ingredient_dishes
+    FROM ingredient_details
+    WHERE ingredient_name ILIKE $1
+        AND year >= 2018
+        AND year <= EXTRACT(YEAR FROM CURRENT_DATE)
+        AND specific_category IS NOT NULL
+        AND specific_category != ''
+        AND ($2::VARCHAR IS NULL OR general_category ILIKE $2)
+    GROUP BY year, specific_category
+),
+yearly_adoption AS (
+    SELECT 
+        yst.year,
+        yst.specific_category AS name,
+        ROUND(
+            COALESCE(ysi.ingredient_dishes, 0) * 100.0 / NULLIF(yst.total_dishes, 0), 
+            2
+        ) AS adoption_percentage
+    FROM yearly_subcategory_totals yst
+    LEFT JOIN yearly_subcategory_ingredient ysi 
+        ON yst.year = ysi.year AND yst.specific_category = ysi.specific_category
+),
+ranked_subcategories AS (
+    -- Top 5 subcategories by total adoption over the first 7 years
+    SELECT 
+        name,
+        ROW_NUMBER() OVER (ORDER BY SUM(adoption_percentage) DESC, name) AS rank
+    FROM yearly_adoption
+    WHERE year IN (SELECT DISTINCT year FROM yearly_adoption ORDER BY year LIMIT 7)
+    GROUP BY name
+    ORDER BY rank
+    LIMIT 5
+)
+SELECT 
+    ya.year,
+    ya.name,
+    ya.adoption_percentage
+FROM yearly_adoption ya
+JOIN ranked_subcategories rs ON ya.name = rs.name
+ORDER BY rs.rank, ya.year;
+"""
+
+def build_query_params(ingredient: str, category: Optional[str]) -> List[Optional[str]]:
+    """Build the bound ILIKE patterns for the ingredient and optional category"""
+    return [f"%{ingredient}%", f"%{category}%" if category else None]
+
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 @router.get("/subcategory/distribution", response_model=List[SubcategoryDistribution])
@@ -37,73 +191,36 @@ async def get_subcategory_distribution(
     category: Optional[str] = Query(None, description="Filter by category")
 ):
     try:
-        ingredient_pattern = f"'%{ingredient}%'"
-        category_filter = f"AND general_category ILIKE '%{category}%'" if category else ""
+        cache_key = ("subcategory/distribution", ingredient.lower(), (category or "").lower())
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return cached
         
-        subcategory_distribution_query = f"""
-        WITH ingredient_counts AS (
-            SELECT 
-                specific_category,
-                year,
-                COUNT(*) AS count
-            FROM ingredient_details
-            WHERE ingredient_name ILIKE {ingredient_pattern}
-                AND specific_category IS NOT NULL
-                AND specific_category != ''
-                {category_filter}
-            GROUP BY specific_category, year
-        ),
-        pivoted AS (
-            SELECT
-                specific_category,
-                SUM(CASE WHEN year = 2023 THEN count ELSE 0 END) AS count_2023,
-                SUM(CASE WHEN year = 2024 THEN count ELSE 0 END) AS count_2024
-            FROM ingredient_counts
-            GROUP BY specific_category
-        ),
-        total AS (
-            SELECT SUM(count_2024) AS total_2024
-            FROM pivoted
-        )
-        SELECT 
-            p.specific_category AS name,
-            p.count_2024 AS dish_count,
-            ROUND(p.count_2024 * 100.0 / NULLIF(t.total_2024, 0), 2) AS value,
-            p.count_2023,
-            ROUND(
-                CASE 
-                    WHEN p.count_2023 = 0 THEN NULL
-                    ELSE ((p.count_2024 - p.count_2023) * 100.0 / p.count_2023)
-                END,
-                2
-            ) AS yoy_growth_percentage
-        FROM pivoted p, total t
-        WHERE p.specific_category IS NOT NULL
-        ORDER BY dish_count DESC;
-        """
+        params = build_query_params(ingredient, category)
         
         result = await execute_query(
-            subcategory_distribution_query,
-            options=QueryOptions(cacheable=True, ttl=3600000)
+            SUBCATEGORY_DISTRIBUTION_QUERY,
+            params,
+            options=QueryOptions(cacheable=True, ttl=3600000, raw_rows=True)
         )
         
-        if result["rows"]:
-            subcategories = []
-            for row in result["rows"]:
-                subcategories.append(SubcategoryDistribution(
-                    name=str(row["name"]),
-                    value=float(row["value"]) if row["value"] is not None else 0.0,
-                    dish_count=int(row["dish_count"]),
-                    count_2023=int(row["count_2023"]) if row["count_2023"] is not None else 0,
-                    yoy_growth_percentage=float(row["yoy_growth_percentage"]) if row["yoy_growth_percentage"] is not None else None
-                ))
-            
-            return subcategories
+        # Rows are tuples in SELECT column order
+        subcategories = [
+            SubcategoryDistribution.model_construct(
+                name=name,
+                value=value if value is not None else 0.0,
+                dish_count=dish_count,
+                count_2023=count_2023 if count_2023 is not None else 0,
+                yoy_growth_percentage=yoy_growth_percentage
+            )
+            for name, dish_count, value, count_2023, yoy_growth_percentage in result["rows"]
+        ]
         
-        return []
+        response_cache.set(cache_key, subcategories)
+        return subcategories
         
-    except Exception as e:
-        print(f"Database query error: {e}")
+    except Exception:
+        logger.exception("Subcategory distribution query failed")
         raise HTTPException(status_code=500, detail="Failed to fetch subcategory distribution data")
 
 @router.get("/subcategory/penetration", response_model=SubcategoryPenetrationData)
@@ -112,85 +229,36 @@ async def get_subcategory_penetration(
     category: Optional[str] = Query(None, description="Filter by category")
 ):
     try:
-        ingredient_pattern = f"'%{ingredient}%'"
-        category_filter = f"AND general_category ILIKE '%{category}%'" if category else ""
+        cache_key = ("subcategory/penetration", ingredient.lower(), (category or "").lower())
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return cached
         
-        subcategory_penetration_query = f"""
-        WITH subcategory_counts AS (
-            SELECT 
-                specific_category,
-                COUNT(*) AS ingredient_count
-            FROM ingredient_details
-            WHERE ingredient_name ILIKE {ingredient_pattern}
-                AND specific_category IS NOT NULL
-                AND specific_category != ''
-                {category_filter}
-            GROUP BY specific_category
-        ),
-        total_counts AS (
-            SELECT 
-                specific_category,
-                COUNT(*) AS total_count
-            FROM ingredient_details
-            WHERE specific_category IS NOT NULL
-                AND specific_category != ''
-                {category_filter}
-            GROUP BY specific_category
-        ),
-        growth_data AS (
-            SELECT 
-                specific_category,
-                COUNT(CASE WHEN year = 2024 THEN 1 ELSE NULL END) AS count_2024,
-                COUNT(CASE WHEN year = 2023 THEN 1 ELSE NULL END) AS count_2023
-            FROM ingredient_details
-            WHERE ingredient_name ILIKE {ingredient_pattern}
-                AND specific_category IS NOT NULL
-                AND specific_category != ''
-                {category_filter}
-            GROUP BY specific_category
-        )
-        SELECT 
-            sc.specific_category AS name,
-            ROUND((sc.ingredient_count * 100.0 / NULLIF(tc.total_count, 0)), 1) AS penetration,
-            CASE
-                WHEN gd.count_2023 = 0 AND gd.count_2024 > 0 THEN 50.0
-                WHEN gd.count_2023 = 0 THEN 0.0
-                ELSE ROUND((gd.count_2024 - gd.count_2023) * 100.0 / NULLIF(gd.count_2023, 0), 1)
-            END AS growth,
-            CASE
-                WHEN gd.count_2023 = 0 AND gd.count_2024 > 0 THEN 'Hot'
-                WHEN gd.count_2023 = 0 THEN 'New'
-                WHEN gd.count_2024 > gd.count_2023 * 1.25 THEN 'Hot'
-                WHEN gd.count_2024 > gd.count_2023 * 1.1 THEN 'Rising'
-                WHEN gd.count_2024 >= gd.count_2023 * 0.9 THEN 'Stable'
-                ELSE 'Declining'
-            END AS status
-        FROM subcategory_counts sc
-        JOIN total_counts tc ON sc.specific_category = tc.specific_category
-        LEFT JOIN growth_data gd ON sc.specific_category = gd.specific_category
-        ORDER BY penetration DESC
-        LIMIT 10;
-        """
+        params = build_query_params(ingredient, category)
         
         result = await execute_query(
-            subcategory_penetration_query,
-            options=QueryOptions(cacheable=True, ttl=3600000)
+            SUBCATEGORY_PENETRATION_QUERY,
+            params,
+            options=QueryOptions(cacheable=True, ttl=3600000, raw_rows=True)
         )
         
-        subcategories = []
-        if result["rows"]:
-            for row in result["rows"]:
-                subcategories.append(SubcategoryPenetration(
-                    name=str(row["name"]),
-                    penetration=float(row["penetration"]) if row["penetration"] is not None else 0.0,
-                    growth=float(row["growth"]) if row["growth"] is not None else 0.0,
-                    status=str(row["status"])
-                ))
+        # Rows are tuples in SELECT column order
+        subcategories = [
+            SubcategoryPenetration.model_construct(
+                name=name,
+                penetration=penetration if penetration is not None else 0.0,
+                growth=growth if growth is not None else 0.0,
+                status=status
+            )
+            for name, penetration, growth, status in result["rows"]
+        ]
         
-        return SubcategoryPenetrationData(subcategories=subcategories)
+        penetration_data = SubcategoryPenetrationData(subcategories=subcategories)
+        response_cache.set(cache_key, penetration_data)
+        return penetration_data
         
-    except Exception as e:
-        print(f"Database query error: {e}")
+    except Exception:
+        logger.exception("Subcategory penetration query failed")
         raise HTTPException(status_code=500, detail="Failed to fetch subcategory penetration data")
 
 @router.get("/subcategory/trends", response_model=SubcategoryTrendData)
@@ -199,74 +267,30 @@ async def get_subcategory_trends(
     category: Optional[str] = Query(None, description="Filter by category")
 ):
     try:
-        ingredient_pattern = f"'%{ingredient}%'"
-        category_filter = f"AND general_category ILIKE '%{category}%'" if category else ""
-        
-        years_query = f"""
-        SELECT DISTINCT year
-        FROM ingredient_details
-        WHERE year >= 2018
-            AND year <= EXTRACT(YEAR FROM CURRENT_DATE)
-        ORDER BY year ASC
-        LIMIT 7;
-        """
+        cache_key = ("subcategory/trends", ingredient.lower(), (category or "").lower())
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return cached
         
-        subcategory_trends_query = f"""
-        WITH yearly_subcategory_totals AS (
-            SELECT 
-                year,
-                specific_category,
-                COUNT(DISTINCT dish_id) AS total_dishes
-            FROM ingredient_details
-            WHERE year >= 2018
-                AND year <= EXTRACT(YEAR FROM CURRENT_DATE)
-                AND specific_category IS NOT NULL
-                AND specific_category != ''
-                {category_filter}
-            GROUP BY year, specific_category
-        ),
-        yearly_subcategory_ingredient AS (
-            SELECT 
-                year,
-                specific_category,
-                COUNT(DISTINCT dish_id) AS ingredient_dishes
-            FROM ingredient_details
-            WHERE ingredient_name ILIKE {ingredient_pattern}
-                AND year >= 2018
-                AND year <= EXTRACT(YEAR FROM CURRENT_DATE)
-                AND specific_category IS NOT NULL
-                AND specific_category != ''
-                {category_filter}
-            GROUP BY year, specific_category
-        )
-        SELECT 
-            yst.year,
-            yst.specific_category AS name,
-            ROUND(
-                COALESCE(ysi.ingredient_dishes, 0) * 100.0 / NULLIF(yst.total_dishes, 0), 
-                2
-            ) AS adoption_percentage
-        FROM yearly_subcategory_totals yst
-        LEFT JOIN yearly_subcategory_ingredient ysi 
-            ON yst.year = ysi.year AND yst.specific_category = ysi.specific_category
-        ORDER BY yst.year ASC, adoption_percentage DESC;
-        """
+        params = build_query_params(ingredient, category)
         
-        # Execute queries
-        years_result, trends_result = await asyncio.gather(
-            execute_query(years_query, options=QueryOptions(cacheable=True, ttl=3600000)),
-            execute_query(subcategory_trends_query, options=QueryOptions(cacheable=True, ttl=3600000))
+        trends_result = await execute_query(
+            SUBCATEGORY_TRENDS_QUERY,
+            params,
+            options=QueryOptions(cacheable=True, ttl=3600000, raw_rows=True)
         )
         
-        if years_result["rows"] and trends_result["rows"]:
-            years = [int(row["year"]) for row in years_result["rows"]]
+        if trends_result["rows"]:
+            # Years come straight from the trend rows (first 7 from 2018 on)
+            years = sorted({year for year, _, _ in trends_result["rows"]})[:7]
+            
+            year_positions = {year: index for index, year in enumerate(years)}
             
             # Process trend data by subcategory
             subcategory_map = {}
             
-            # Group data by subcategory
-            for row in trends_result["rows"]:
-                subcategory_name = str(row["name"])
+            # Group data by subcategory; rows are (year, name, adoption_percentage) tuples
+            for year, subcategory_name, adoption_percentage in trends_result["rows"]:
                 if subcategory_name not in subcategory_map:
                     subcategory_map[subcategory_name] = {
                         "name": subcategory_name,
@@ -274,29 +298,26 @@ async def get_subcategory_trends(
                     }
                 
                 # Find the index for this year
-                year_index = years.index(int(row["year"])) if int(row["year"]) in years else -1
+                year_index = year_positions.get(year, -1)
                 if year_index >= 0:
-                    subcategory_map[subcategory_name]["adoption_percentages"][year_index] = float(row["adoption_percentage"] or 0.0)
-            
-            # Convert to list and take top 5 subcategories by total adoption
-            sorted_subcategories = sorted(
-                subcategory_map.values(),
-                key=lambda x: sum(x["adoption_percentages"]),
-                reverse=True
-            )[:5]
+                    subcategory_map[subcategory_name]["adoption_percentages"][year_index] = adoption_percentage or 0.0
             
+            # Rows arrive already limited to the top 5 subcategories, in rank order
             subcategories = [
-                SubcategoryTrend(
+                SubcategoryTrend.model_construct(
                     name=subcategory["name"],
                     adoption_percentages=subcategory["adoption_percentages"]
                 )
-                for subcategory in sorted_subcategories
+                for subcategory in subcategory_map.values()
             ]
             
-            return SubcategoryTrendData(years=years, subcategories=subcategories)
+            trend_data = SubcategoryTrendData(years=years, subcategories=subcategories)
+        else:
+            trend_data = SubcategoryTrendData(years=[], subcategories=[])
         
-        return SubcategoryTrendData(years=[], subcategories=[])
+        response_cache.set(cache_key, trend_data)
+        return trend_data
         
-    except Exception as e:
-        print(f"Database query error: {e}")
+    except Exception:
+        logger.exception("Subcategory trends query failed")
         raise HTTPException(status_code=500, detail="Failed to fetch subcategory trends data")
\ No newline at end of file
@@ -1,8 +1,9 @@
 # routers/texture_router.py
 from fastapi import APIRouter, HTTPException, Query
-from database.connection import execute_query, QueryOptions
+from database.connection import execute_query, QueryOptions, response_cache
 from pydantic import BaseModel
 from typing import List, Dict
+import logging
 
 class TextureAttribute(BaseModel):
     name: str
@@ -16,131 +17,108 @@ class TextureData(BaseModel):
     texture_attributes: List[TextureAttribute]
     texture_trends: List[TextureTrend]
 
+# Texture attributes and their yearly trends in one pass over each table; the
+# ingredient pattern is bound as $1. Each dish belongs to a single year, so the
+# overall counts are sums of the yearly ones.
+TEXTURE_QUERY = """
+WITH yearly_texture AS (
+    SELECT 
+        year,
+        texture_attribute,
+        COUNT(DISTINCT dish_id) AS dishes_with_texture
+    FROM ingredient_texture
+    WHERE ingredient_name ILIKE $1
+    GROUP BY year, texture_attribute
+),
+yearly_ingredient_dishes AS (
+    SELECT 
+        year,
+        COUNT(DISTINCT dish_id) AS total_dishes
+    FROM ingredient_details
+    WHERE ingredient_name ILIKE $1
+    GROUP BY year
+),
+top_textures AS (
+    -- Top 8 texture attributes overall
+    SELECT 
+        texture_attribute,
+        SUM(dishes_with_texture) AS dishes_with_texture
+    FROM yearly_texture
+    GROUP BY texture_attribute
+    ORDER BY dishes_with_texture DESC
+    LIMIT 8
+),
+ingredient_dishes AS (
+    SELECT SUM(total_dishes) AS total_dishes
+    FROM yearly_ingredient_dishes
+)
+SELECT 
+    'attribute' AS kind,
+    NULL::INTEGER AS year,
+    tt.texture_attribute,
+    ROUND((tt.dishes_with_texture * 100.0 / NULLIF(id.total_dishes, 0)), 2) AS proportion
+FROM top_textures tt
+CROSS JOIN ingredient_dishes id
+UNION ALL
+SELECT 
+    'trend' AS kind,
+    CAST(yt.year AS INTEGER) AS year,
+    yt.texture_attribute,
+    ROUND((yt.dishes_with_texture * 100.0 / NULLIF(yid.total_dishes, 0)), 2) AS proportion
+FROM yearly_texture yt
+JOIN top_textures tt ON yt.texture_attribute = tt.texture_attribute
+JOIN yearly_ingredient_dishes yid ON yt.year = yid.year
+ORDER BY kind, year, proportion DESC, texture_attribute;
+"""
+
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 @router.get("/texture-attributes", response_model=TextureData)
 async def get_texture_attributes(ingredient: str = Query(..., description="Ingredient name")):
     try:
-        ingredient_pattern = f"'%{ingredient}%'"
+        cache_key = ("texture-attributes", ingredient.lower())
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return cached
         
-        # Get top 8 texture attributes by proportion
-        texture_attribute_query = f"""
-        WITH ingredient_dishes AS (
-            SELECT COUNT(DISTINCT dish_id) AS total_dishes
-            FROM ingredient_details
-            WHERE ingredient_name ILIKE {ingredient_pattern}
-        ),
-        texture_counts AS (
-            SELECT 
-                texture_attribute,
-                COUNT(DISTINCT dish_id) AS dishes_with_texture
-            FROM ingredient_texture
-            WHERE ingredient_name ILIKE {ingredient_pattern}
-            GROUP BY texture_attribute
-        )
-        SELECT 
-            texture_attribute AS name,
-            ROUND((dishes_with_texture * 100.0 / NULLIF(id.total_dishes, 0)), 2) AS proportion
-        FROM texture_counts tc
-        CROSS JOIN ingredient_dishes id
-        ORDER BY proportion DESC
-        LIMIT 8;
-        """
+        params = [f"%{ingredient}%"]
         
-        # Get proportions over time for top 8 textures
-        texture_trends_query = f"""
-        WITH top_textures AS (
-            WITH ingredient_dishes AS (
-                SELECT COUNT(DISTINCT dish_id) AS total_dishes
-                FROM ingredient_details
-                WHERE ingredient_name ILIKE {ingredient_pattern}
-            ),
-            texture_counts AS (
-                SELECT 
-                    texture_attribute,
-                    COUNT(DISTINCT dish_id) AS dishes_with_texture
-                FROM ingredient_texture
-                WHERE ingredient_name ILIKE {ingredient_pattern}
-                GROUP BY texture_attribute
-            )
-            SELECT texture_attribute
-            FROM texture_counts tc
-            CROSS JOIN ingredient_dishes id
-            ORDER BY (dishes_with_texture * 100.0 / NULLIF(id.total_dishes, 0)) DESC
-            LIMIT 8
-        ),
-        yearly_ingredient_dishes AS (
-            SELECT 
-                year,
-                COUNT(DISTINCT dish_id) AS total_dishes
-            FROM ingredient_details
-            WHERE ingredient_name ILIKE {ingredient_pattern}
-            GROUP BY year
-        ),
-        yearly_texture AS (
-            SELECT 
-                year,
-                texture_attribute,
-                COUNT(DISTINCT dish_id) AS dishes_with_texture
-            FROM ingredient_texture
-            WHERE ingredient_name ILIKE {ingredient_pattern}
-            AND texture_attribute IN (SELECT texture_attribute FROM top_textures)
-            GROUP BY year, texture_attribute
+        result = await execute_query(
+            TEXTURE_QUERY,
+            params,
+            options=QueryOptions(cacheable=True, ttl=3600000, raw_rows=True)
         )
-        SELECT 
-            yt.year,
-            yt.texture_attribute,
-            ROUND((yt.dishes_with_texture * 100.0 / NULLIF(yid.total_dishes, 0)), 2) AS proportion
-        FROM yearly_texture yt
-        JOIN yearly_ingredient_dishes yid ON yt.year = yid.year
-        ORDER BY yt.year, yt.texture_attribute;
-        """
         
-        # Execute queries
-        attributes_result = await execute_query(
-            texture_attribute_query, 
-            options=QueryOptions(cacheable=True, ttl=3600000)
-        )
-        trends_result = await execute_query(
-            texture_trends_query,
-            options=QueryOptions(cacheable=True, ttl=3600000)
-        )
-        
-        # Process texture attributes
+        # Rows are (kind, year, texture_attribute, proportion) tuples; attributes
+        # come first, ordered by proportion
         texture_attributes = []
-        if attributes_result["rows"]:
-            for row in attributes_result["rows"]:
-                texture_attributes.append(TextureAttribute(
-                    name=row["name"],
-                    proportion=float(row["proportion"])
+        year_data = {}
+        for kind, year, texture, proportion in result["rows"]:
+            if kind == "attribute":
+                texture_attributes.append(TextureAttribute.model_construct(
+                    name=texture,
+                    proportion=proportion
                 ))
-        
-        # Process trends data
-        texture_trends = []
-        if trends_result["rows"]:
-            # Group by year
-            year_data = {}
-            for row in trends_result["rows"]:
-                year = int(row["year"])
-                texture = row["texture_attribute"]
-                proportion = float(row["proportion"])
-                
+            else:
                 if year not in year_data:
                     year_data[year] = {}
                 year_data[year][texture] = proportion
-            
-            # Convert to list format
-            for year in sorted(year_data.keys()):
-                texture_trends.append(TextureTrend(
-                    year=year,
-                    proportions=year_data[year]
-                ))
         
-        return TextureData(
+        # Convert trends to list format
+        texture_trends = [
+            TextureTrend.model_construct(year=year, proportions=year_data[year])
+            for year in sorted(year_data.keys())
+        ]
+        
+        texture_data = TextureData(
             texture_attributes=texture_attributes,
             texture_trends=texture_trends
         )
+        response_cache.set(cache_key, texture_data)
+        return texture_data
         
-    except Exception as e:
-        print(f"Database query error: {e}")
+    except Exception:
+        logger.exception("Texture attributes query failed")
         raise HTTPException(status_code=500, detail="Failed to fetch texture attributes data")
\ No newline at end of file
@@ -1,9 +1,11 @@
 # routers/category_analysis_router.py
 from fastapi import APIRouter, HTTPException, Query
-from database.connection import execute_query, QueryOptions
+from fastapi.responses import ORJSONResponse
+from database.connection import fetch, negative_cache, response_cache
 from pydantic import BaseModel
 from typing import List, Optional
 from config import CURRENT_YEAR  # Import CURRENT_YEAR from config
+import logging
 
 class CategoryDistribution(BaseModel):
     name: str
@@ -42,152 +44,237 @@ class CategoryAnalysisResponse(BaseModel):
     insights: List[CategoryInsight]
     summary: str
 
+PREVIOUS_YEAR = CURRENT_YEAR - 1
+DISTRIBUTION_LIMIT = 50  # Top categories by dish count returned in the distribution
+
+# Distribution, penetration and the headline analysis in one round trip, tagged
+# by kind. Distribution
+# uses overall data with growth from PREVIOUS_YEAR->CURRENT_YEAR; penetration
+# growth is in percentage points. Years are process-constant and baked in at
+# import; the lowercased ingredient pattern is bound as $1
+CATEGORY_ANALYSIS_QUERY = f"""
+WITH matching_dishes AS (
+    -- Keyed lookup on the ingredient_category_yearly roll-up; only the rows for
+    -- matching names are expanded to their dishes
+    SELECT
+        general_category,
+        year,
+        UNNEST(dish_ids) AS dish_id
+    FROM ingredient_category_yearly
+    WHERE ingredient_name_lower LIKE $1
+        AND general_category IS NOT NULL
+),
+ingredient_counts AS (
+    -- Overall and per-year ingredient dishes by category
+    SELECT 
+        general_category,
+        COUNT(DISTINCT dish_id) AS total_dish_count,
+        COUNT(DISTINCT dish_id) FILTER (WHERE year = {PREVIOUS_YEAR}) AS count_previous,
+        COUNT(DISTINCT dish_id) FILTER (WHERE year = {CURRENT_YEAR}) AS count_current
+    FROM matching_dishes
+    GROUP BY general_category
+),
+total_ingredient_dishes AS (
+    SELECT COUNT(DISTINCT dish_id) AS total
+    FROM matching_dishes
+),
+category_totals AS (
+    -- Ingredient-independent totals from the precomputed category_year_totals table
+    SELECT 
+        general_category,
+        COALESCE(SUM(dish_count) FILTER (WHERE year = {PREVIOUS_YEAR}), 0) AS total_previous,
+        COALESCE(SUM(dish_count) FILTER (WHERE year = {CURRENT_YEAR}), 0) AS total_current
+    FROM category_year_totals
+    GROUP BY general_category
+),
+category_counts AS (
+    SELECT 
+        ct.general_category,
+        COALESCE(ic.total_dish_count, 0) AS total_dish_count,
+        COALESCE(ic.count_previous, 0) AS count_previous,
+        COALESCE(ic.count_current, 0) AS count_current,
+        ct.total_previous,
+        ct.total_current
+    FROM category_totals ct
+    LEFT JOIN ingredient_counts ic ON ct.general_category = ic.general_category
+),
+distribution AS (
+    SELECT 
+        cc.general_category AS name,
+        cc.total_dish_count AS dish_count,
+        ROUND(cc.total_dish_count * 100.0 / NULLIF(tid.total, 0), 2) AS value,
+        cc.count_previous,
+        ROUND(
+            CASE 
+                WHEN cc.count_previous = 0 THEN NULL
+                ELSE ((cc.count_current - cc.count_previous) * 100.0 / NULLIF(cc.count_previous, 0))
+            END,
+            2
+        ) AS yoy_growth_percentage
+    FROM category_counts cc
+    CROSS JOIN total_ingredient_dishes tid
+    WHERE cc.total_dish_count > 0
+    ORDER BY dish_count DESC, name
+    LIMIT {DISTRIBUTION_LIMIT}
+),
+penetration AS (
+    SELECT 
+        cc.general_category AS name,
+        ROUND(cc.count_current * 100.0 / NULLIF(cc.total_current, 0), 1) AS penetration,
+        ROUND(cc.count_previous * 100.0 / NULLIF(cc.total_previous, 0), 1) AS previous_penetration,
+        ROUND(
+            (cc.count_current * 100.0 / NULLIF(cc.total_current, 0)) - 
+            (cc.count_previous * 100.0 / NULLIF(cc.total_previous, 0)), 
+            1
+        ) AS growth,
+        CASE
+            WHEN cc.count_previous = 0 AND cc.count_current > 0 THEN 'Hot'
+            WHEN (cc.count_current * 100.0 / NULLIF(cc.total_current, 0)) - 
+                 (cc.count_previous * 100.0 / NULLIF(cc.total_previous, 0)) > 5 THEN 'Hot'
+            WHEN (cc.count_current * 100.0 / NULLIF(cc.total_current, 0)) - 
+                 (cc.count_previous * 100.0 / NULLIF(cc.total_previous, 0)) > 1 THEN 'Rising'
+            WHEN (cc.count_current * 100.0 / NULLIF(cc.total_current, 0)) - 
+                 (cc.count_previous * 100.0 / NULLIF(cc.total_previous, 0)) >= -1 THEN 'Stable'
+            ELSE 'Declining'
+        END AS status
+    FROM category_counts cc
+    WHERE cc.total_current > 0  -- Only include categories with current year data
+    ORDER BY penetration DESC, name
+    LIMIT 10
+),
+analysis AS (
+    -- Headline aggregates over the penetration rows; ties resolve in
+    -- penetration order
+    SELECT struct_pack(
+        highest_penetration := FIRST(name ORDER BY penetration DESC NULLS LAST, name),
+        highest_penetration_rate := MAX(COALESCE(penetration, 0.0)),
+        fastest_growing := FIRST(name ORDER BY COALESCE(growth, 0.0) DESC, penetration DESC NULLS LAST, name),
+        fastest_growth_rate := MAX(COALESCE(growth, 0.0)),
+        total_categories := COUNT(*),
+        hot_categories := COUNT(*) FILTER (WHERE status IN ('Hot', 'Rising')),
+        declining_categories := COUNT(*) FILTER (WHERE status = 'Declining'),
+        avg_penetration := AVG(COALESCE(penetration, 0.0))
+    ) AS analysis
+    FROM penetration
+)
+SELECT 
+    'distribution' AS kind,
+    name,
+    dish_count,
+    count_previous,
+    value,
+    NULL AS previous_value,
+    yoy_growth_percentage AS growth,
+    NULL AS status,
+    NULL AS analysis
+FROM distribution
+UNION ALL
+SELECT 
+    'penetration' AS kind,
+    name,
+    NULL AS dish_count,
+    NULL AS count_previous,
+    penetration AS value,
+    previous_penetration AS previous_value,
+    growth,
+    status,
+    NULL AS analysis
+FROM penetration
+UNION ALL
+SELECT 
+    'analysis' AS kind,
+    NULL AS name,
+    NULL AS dish_count,
+    NULL AS count_previous,
+    NULL AS value,
+    NULL AS previous_value,
+    NULL AS growth,
+    NULL AS status,
+    analysis
+FROM analysis
+ORDER BY kind, dish_count DESC, value DESC, name;
+"""
+
+# Cheap probe against the distinct names table, run before the analysis query so
+# unknown ingredients 404 without scanning ingredient_details
+INGREDIENT_EXISTS_QUERY = """
+SELECT EXISTS (
+    SELECT 1
+    FROM ingredient_names
+    WHERE ingredient_name_lower LIKE $1
+);
+"""
+
+# Insight sentence per status (Hot and Stable split on growth / penetration)
+INSIGHT_TEMPLATES = {
+    'hot_explosive': "Explosive growth (+{growth:.1f}pp) with {penetration:.1f}% penetration",
+    'hot_strong': "Strong momentum (+{growth:.1f}pp) in established market",
+    'rising': "Growing adoption (+{growth:.1f}pp) with {penetration:.1f}% penetration",
+    'stable_mature': "Mature market with {penetration:.1f}% penetration, stable performance",
+    'stable_steady': "Steady {penetration:.1f}% penetration, potential for growth",
+    'declining': "Declining adoption ({growth:.1f}pp) despite {penetration:.1f}% penetration",
+}
+DEFAULT_INSIGHT_TEMPLATE = "Current penetration: {penetration:.1f}%"
+DISH_COUNT_SUFFIX = " ({dish_count} dishes)"
+
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
-@router.get("/category/analysis", response_model=CategoryAnalysisResponse)
+@router.get("/category/analysis", response_model=CategoryAnalysisResponse, response_class=ORJSONResponse)
 async def get_category_analysis(ingredient: str = Query(..., description="Ingredient name")):
     try:
-        ingredient_pattern = f"'%{ingredient}%'"
-        previous_year = CURRENT_YEAR - 1
-        
-        # Distribution query - using overall data with growth from previous_year->CURRENT_YEAR
-        category_distribution_query = f"""
-        WITH overall_counts AS (
-            -- Overall distribution across all years
-            SELECT 
-                general_category,
-                COUNT(DISTINCT dish_id) AS total_dish_count
-            FROM ingredient_details
-            WHERE ingredient_name ILIKE {ingredient_pattern}
-                AND general_category IS NOT NULL
-            GROUP BY general_category
-        ),
-        growth_counts AS (
-            -- Growth calculation: previous_year vs CURRENT_YEAR
-            SELECT 
-                general_category,
-                COUNT(DISTINCT CASE WHEN year = {previous_year} THEN dish_id END) AS count_previous,
-                COUNT(DISTINCT CASE WHEN year = {CURRENT_YEAR} THEN dish_id END) AS count_current
-            FROM ingredient_details
-            WHERE ingredient_name ILIKE {ingredient_pattern}
-                AND general_category IS NOT NULL
-            GROUP BY general_category
-        ),
-        total_ingredient_dishes AS (
-            SELECT COUNT(DISTINCT dish_id) AS total
-            FROM ingredient_details
-            WHERE ingredient_name ILIKE {ingredient_pattern}
-                AND general_category IS NOT NULL
-        )
-        SELECT 
-            oc.general_category AS name,
-            oc.total_dish_count AS dish_count,
-            ROUND(oc.total_dish_count * 100.0 / NULLIF(tid.total, 0), 2) AS value,
-            COALESCE(gc.count_previous, 0) AS count_previous,
-            ROUND(
-                CASE 
-                    WHEN gc.count_previous = 0 OR gc.count_previous IS NULL THEN NULL
-                    ELSE ((gc.count_current - gc.count_previous) * 100.0 / NULLIF(gc.count_previous, 0))
-                END,
-                2
-            ) AS yoy_growth_percentage
-        FROM overall_counts oc
-        LEFT JOIN growth_counts gc ON oc.general_category = gc.general_category
-        CROSS JOIN total_ingredient_dishes tid
-        ORDER BY dish_count DESC;
-        """
-        
-        # Simplified penetration query with percentage points growth
-        category_penetration_query = f"""
-        WITH ingredient_counts_by_year AS (
-            -- Count ingredient dishes by category and year
-            SELECT 
-                general_category,
-                COUNT(DISTINCT CASE WHEN year = {previous_year} THEN dish_id END) AS ingredient_previous,
-                COUNT(DISTINCT CASE WHEN year = {CURRENT_YEAR} THEN dish_id END) AS ingredient_current
-            FROM ingredient_details
-            WHERE ingredient_name ILIKE {ingredient_pattern}
-                AND general_category IS NOT NULL
-            GROUP BY general_category
-        ),
-        total_counts_by_year AS (
-            -- Count total dishes by category and year
-            SELECT 
-                general_category,
-                COUNT(DISTINCT CASE WHEN year = {previous_year} THEN dish_id END) AS total_previous,
-                COUNT(DISTINCT CASE WHEN year = {CURRENT_YEAR} THEN dish_id END) AS total_current
-            FROM ingredient_details
-            WHERE general_category IS NOT NULL
-            GROUP BY general_category
-        )
-        SELECT 
-            tc.general_category AS name,
-            ROUND(ic.ingredient_current * 100.0 / NULLIF(tc.total_current, 0), 1) AS penetration,
-            ROUND(ic.ingredient_previous * 100.0 / NULLIF(tc.total_previous, 0), 1) AS previous_penetration,
-            ROUND(
-                (ic.ingredient_current * 100.0 / NULLIF(tc.total_current, 0)) - 
-                (ic.ingredient_previous * 100.0 / NULLIF(tc.total_previous, 0)), 
-                1
-            ) AS growth,
-            CASE
-                WHEN ic.ingredient_previous = 0 AND ic.ingredient_current > 0 THEN 'Hot'
-                WHEN (ic.ingredient_current * 100.0 / NULLIF(tc.total_current, 0)) - 
-                     (ic.ingredient_previous * 100.0 / NULLIF(tc.total_previous, 0)) > 5 THEN 'Hot'
-                WHEN (ic.ingredient_current * 100.0 / NULLIF(tc.total_current, 0)) - 
-                     (ic.ingredient_previous * 100.0 / NULLIF(tc.total_previous, 0)) > 1 THEN 'Rising'
-                WHEN (ic.ingredient_current * 100.0 / NULLIF(tc.total_current, 0)) - 
-                     (ic.ingredient_previous * 100.0 / NULLIF(tc.total_previous, 0)) >= -1 THEN 'Stable'
-                ELSE 'Declining'
-            END AS status
-        FROM total_counts_by_year tc
-        LEFT JOIN ingredient_counts_by_year ic ON tc.general_category = ic.general_category
-        WHERE tc.total_current > 0  -- Only include categories with current year data
-        ORDER BY penetration DESC
-        LIMIT 10;
-        """
+        # Normalize at entry so e.g. "Garlic" and "garlic " share one cache entry
+        ingredient = ingredient.strip().lower()
+        cache_key = ("category/analysis", ingredient)
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return cached
         
-        # Execute queries
-        dist_result = await execute_query(
-            category_distribution_query,
-            options=QueryOptions(cacheable=True, ttl=3600000)
-        )
-        
-        pen_result = await execute_query(
-            category_penetration_query,
-            options=QueryOptions(cacheable=True, ttl=3600000)
-        )
+        if negative_cache.get(cache_key) is not None:
+            raise HTTPException(status_code=404, detail=f"No category data found for ingredient: {ingredient}")
         
-        if not dist_result["rows"] or not pen_result["rows"]:
+        pattern = f"%{ingredient}%"
+        [(ingredient_exists,)] = await fetch(INGREDIENT_EXISTS_QUERY, pattern)
+        if not ingredient_exists:
+            negative_cache.set(cache_key, True)
             raise HTTPException(status_code=404, detail=f"No category data found for ingredient: {ingredient}")
         
-        # Process distribution data
-        distribution = []
-        for row in dist_result["rows"]:
-            distribution.append(CategoryDistribution(
-                name=str(row["name"]),
-                value=float(row["value"]) if row["value"] is not None else 0.0,
-                dish_count=int(row["dish_count"]),
-                count_previous=int(row["count_previous"]) if row["count_previous"] is not None else 0,
-                yoy_growth_percentage=float(row["yoy_growth_percentage"]) if row["yoy_growth_percentage"] is not None else None
-            ))
+        rows = await fetch(CATEGORY_ANALYSIS_QUERY, pattern)
         
-        # Process penetration data
+        # Split distribution and penetration rows in a single pass; rows are
+        # tuples in SELECT column order
+        distribution = []
         penetration = []
-        for row in pen_result["rows"]:
-            penetration.append(CategoryPenetration(
-                name=str(row["name"]),
-                penetration=float(row["penetration"]) if row["penetration"] is not None else 0.0,
-                previous_penetration=float(row["previous_penetration"]) if row["previous_penetration"] is not None else 0.0,
-                growth=float(row["growth"]) if row["growth"] is not None else 0.0,
-                status=str(row["status"])
-            ))
+        analysis = None
+        for kind, name, dish_count, count_previous, value, previous_value, growth, status, aggregates in rows:
+            if kind == "analysis":
+                analysis = CategoryAnalysis.model_construct(**aggregates)
+            elif kind == "distribution":
+                distribution.append(CategoryDistribution.model_construct(
+                    name=name,
+                    value=value if value is not None else 0.0,
+                    dish_count=dish_count,
+                    count_previous=count_previous if count_previous is not None else 0,
+                    yoy_growth_percentage=growth
+                ))
+            else:
+                penetration.append(CategoryPenetration.model_construct(
+                    name=name,
+                    penetration=value if value is not None else 0.0,
+                    previous_penetration=previous_value if previous_value is not None else 0.0,
+                    growth=growth if growth is not None else 0.0,
+                    status=status
+                ))
+        
+        if not distribution or not penetration:
+            raise HTTPException(status_code=404, detail=f"No category data found for ingredient: {ingredient}")
         
-        # Generate analysis
-        analysis = calculate_category_analysis(penetration)
+        # Generate insights
         insights = generate_category_insights(penetration, distribution)
         summary = generate_summary(ingredient, penetration, analysis)
         
-        return CategoryAnalysisResponse(
+        analysis_response = CategoryAnalysisResponse(
             ingredient=ingredient,
             distribution=distribution,
             penetration=penetration,
@@ -195,87 +282,51 @@ async def get_category_analysis(ingredient: str = Query(..., description="Ingred
             insights=insights,
             summary=summary
         )
+        response_cache.set(cache_key, analysis_response)
+        return analysis_response
         
     except HTTPException:
         raise
-    except Exception as e:
-        print(f"Database query error: {e}")
+    except Exception:
+        logger.exception("Category analysis query failed")
         raise HTTPException(status_code=500, detail="Failed to fetch category analysis data")
 
 
-def calculate_category_analysis(penetration: List[CategoryPenetration]) -> CategoryAnalysis:
-    """Calculate comprehensive category analysis"""
-    
-    if not penetration:
-        return CategoryAnalysis(
-            highest_penetration="Unknown",
-            highest_penetration_rate=0.0,
-            fastest_growing="Unknown",
-            fastest_growth_rate=0.0,
-            total_categories=0,
-            hot_categories=0,
-            declining_categories=0,
-            avg_penetration=0.0
-        )
-    
-    # Find highest penetration
-    highest_pen = max(penetration, key=lambda x: x.penetration)
-    
-    # Find fastest growing (by percentage points)
-    fastest_growing = max(penetration, key=lambda x: x.growth)
-    
-    # Count categories by status
-    hot_count = len([cat for cat in penetration if cat.status in ['Hot', 'Rising']])
-    declining_count = len([cat for cat in penetration if cat.status == 'Declining'])
-    
-    # Calculate average penetration
-    avg_penetration = sum(cat.penetration for cat in penetration) / len(penetration)
-    
-    return CategoryAnalysis(
-        highest_penetration=highest_pen.name,
-        highest_penetration_rate=highest_pen.penetration,
-        fastest_growing=fastest_growing.name,
-        fastest_growth_rate=fastest_growing.growth,
-        total_categories=len(penetration),
-        hot_categories=hot_count,
-        declining_categories=declining_count,
-        avg_penetration=avg_penetration
-    )
-
-
 def generate_category_insights(penetration: List[CategoryPenetration], distribution: List[CategoryDistribution]) -> List[CategoryInsight]:
     """Generate insights for each category"""
     
     insights = []
     
-    # Top 5 categories by penetration
+    # Index distribution by category name once instead of scanning it per category
+    dist_by_name = {d.name: d for d in distribution}
+    
+    # Top 5 categories by penetration. The query already returns penetration
+    # rows in descending penetration order (its ORDER BY must keep that), so the
+    # leading slice is the top 5 without re-sorting
     for category in penetration[:5]:
         # Find corresponding distribution data
-        dist_data = next((d for d in distribution if d.name == category.name), None)
+        dist_data = dist_by_name.get(category.name)
         
-        insight = ""
         opportunity_type = category.status.lower()
         
         if category.status == 'Hot':
-            if category.growth > 10:
-                insight = f"Explosive growth (+{category.growth:.1f}pp) with {category.penetration:.1f}% penetration"
-            else:
-                insight = f"Strong momentum (+{category.growth:.1f}pp) in established market"
-        elif category.status == 'Rising':
-            insight = f"Growing adoption (+{category.growth:.1f}pp) with {category.penetration:.1f}% penetration"
+            template_key = 'hot_explosive' if category.growth > 10 else 'hot_strong'
         elif category.status == 'Stable':
-            if category.penetration > 50:
-                insight = f"Mature market with {category.penetration:.1f}% penetration, stable performance"
-            else:
-                insight = f"Steady {category.penetration:.1f}% penetration, potential for growth"
-        elif category.status == 'Declining':
-            insight = f"Declining adoption ({category.growth:.1f}pp) despite {category.penetration:.1f}% penetration"
+            template_key = 'stable_mature' if category.penetration > 50 else 'stable_steady'
         else:
-            insight = f"Current penetration: {category.penetration:.1f}%"
+            template_key = opportunity_type
+        
+        template = INSIGHT_TEMPLATES.get(template_key, DEFAULT_INSIGHT_TEMPLATE)
         
         # Add dish count context if available
         if dist_data and dist_data.dish_count > 0:
-            insight += f" ({dist_data.dish_count} dishes)"
+            template += DISH_COUNT_SUFFIX
+        
+        insight = template.format(
+            growth=category.growth,
+            penetration=category.penetration,
+            dish_count=dist_data.dish_count if dist_data else 0
+        )
         
         insights.append(CategoryInsight(
             category=category.name,
@@ -292,25 +343,27 @@ def generate_summary(ingredient: str, penetration: List[CategoryPenetration], an
     if not penetration:
         return f"No category analysis data available for {ingredient}."
     
-    summary = f"{ingredient.title()} shows strong presence across {analysis.total_categories} food service categories. "
-    
-    # Top performer insight
-    summary += f"{analysis.highest_penetration} leads with {analysis.highest_penetration_rate:.1f}% penetration, "
+    ingredient_title = ingredient.title()
     
     # Growth insight
     if analysis.fastest_growth_rate > 5:
-        summary += f"while {analysis.fastest_growing} demonstrates exceptional growth (+{analysis.fastest_growth_rate:.1f}pp). "
+        growth_fragment = f"while {analysis.fastest_growing} demonstrates exceptional growth (+{analysis.fastest_growth_rate:.1f}pp). "
     elif analysis.fastest_growth_rate > 1:
-        summary += f"with {analysis.fastest_growing} showing solid growth (+{analysis.fastest_growth_rate:.1f}pp). "
+        growth_fragment = f"with {analysis.fastest_growing} showing solid growth (+{analysis.fastest_growth_rate:.1f}pp). "
     else:
-        summary += f"with generally stable performance across categories. "
+        growth_fragment = "with generally stable performance across categories. "
     
     # Market health
     if analysis.hot_categories > analysis.declining_categories:
-        summary += f"Market shows positive momentum with {analysis.hot_categories} hot/rising categories "
+        health_fragment = f"Market shows positive momentum with {analysis.hot_categories} hot/rising categories "
     else:
-        summary += f"Market shows mixed signals with {analysis.declining_categories} declining categories "
-    
-    summary += f"and {analysis.avg_penetration:.1f}% average penetration rate."
+        health_fragment = f"Market shows mixed signals with {analysis.declining_categories} declining categories "
     
-    return summary
\ No newline at end of file
+    return "".join((
+        f"{ingredient_title} shows strong presence across {analysis.total_categories} food service categories. ",
+        # Top performer insight
+        f"{analysis.highest_penetration} leads with {analysis.highest_penetration_rate:.1f}% penetration, ",
+        growth_fragment,
+        health_fragment,
+        f"and {analysis.avg_penetration:.1f}% average penetration rate.",
+    ))
\ No newline at end of file
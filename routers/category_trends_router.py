@@ -1,9 +1,11 @@
 # routers/category_trends_router.py
 from fastapi import APIRouter, HTTPException, Query
-from database.connection import execute_query, QueryOptions
+from fastapi.responses import ORJSONResponse
+from database.connection import execute_query, QueryOptions, response_cache
 from pydantic import BaseModel
 from typing import List
-import asyncio
+from collections import defaultdict
+import logging
 
 class CategoryTrend(BaseModel):
     name: str
@@ -31,100 +33,124 @@ class CategoryTrendResponse(BaseModel):
     insights: List[CategoryInsight]
     summary: str
 
+# Query text is fixed so only the bound ingredient pattern ($1) varies between
+# requests. Ingredient dishes come from the ingredient_category_yearly roll-up,
+# matched on the lowercased name, instead of scanning ingredient_details.
+# Per-category yearly totals are ingredient-independent and come from the
+# precomputed category_year_totals table; the years axis is derived from the
+# result rows instead of a separate DISTINCT year query. Only the top 5
+# categories by total adoption are returned
+CATEGORY_TRENDS_QUERY = """
+WITH ingredient_dishes AS (
+    -- A dish can list several matching names; dedupe once so the per-group
+    -- count below is a plain COUNT(*)
+    SELECT DISTINCT
+        UNNEST(dish_ids) AS dish_id,
+        year,
+        general_category
+    FROM ingredient_category_yearly
+    WHERE ingredient_name_lower LIKE $1
+        AND year >= 2018
+        AND year <= EXTRACT(YEAR FROM CURRENT_DATE)
+        AND general_category IS NOT NULL
+),
+yearly_category_ingredient AS (
+    SELECT 
+        year,
+        general_category AS category,
+        COUNT(*) AS ingredient_dishes
+    FROM ingredient_dishes
+    GROUP BY year, general_category
+),
+yearly_adoption AS (
+    SELECT 
+        cyt.year,
+        cyt.general_category AS name,
+        ROUND(
+            COALESCE(yci.ingredient_dishes, 0) * 100.0 / NULLIF(cyt.dish_count, 0), 
+            2
+        ) AS adoption_percentage
+    FROM category_year_totals cyt
+    LEFT JOIN yearly_category_ingredient yci 
+        ON cyt.year = yci.year AND cyt.general_category = yci.category
+    WHERE cyt.year >= 2018
+        AND cyt.year <= EXTRACT(YEAR FROM CURRENT_DATE)
+),
+ranked_categories AS (
+    -- Top 5 categories by total adoption over the first 7 years
+    SELECT 
+        name,
+        ROW_NUMBER() OVER (ORDER BY SUM(adoption_percentage) DESC, name) AS rank
+    FROM yearly_adoption
+    WHERE year IN (SELECT DISTINCT year FROM yearly_adoption ORDER BY year LIMIT 7)
+    GROUP BY name
+    ORDER BY rank
+    LIMIT 5
+)
+SELECT 
+    ya.year,
+    ya.name,
+    ya.adoption_percentage
+FROM yearly_adoption ya
+JOIN ranked_categories rc ON ya.name = rc.name
+ORDER BY rc.rank, ya.year;
+"""
+
+# Summary fragments keyed by the lower bound they apply above, checked in order
+GROWTH_SUMMARY_TEMPLATES = (
+    (30, "while {name} demonstrates exceptional growth (+{rate:.0f}%). "),
+    (10, "with {name} showing solid growth (+{rate:.0f}%). "),
+)
+DEFAULT_GROWTH_SUMMARY = "with generally stable category performance. "
+PRESENCE_SUMMARY_TEMPLATES = (
+    (10, "The ingredient maintains strong market presence with {rate:.1f}% average adoption "),
+    (5, "The ingredient shows moderate market presence with {rate:.1f}% average adoption "),
+)
+DEFAULT_PRESENCE_SUMMARY = "The ingredient has emerging market presence with {rate:.1f}% average adoption "
+
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
-@router.get("/category/trends", response_model=CategoryTrendResponse)
+@router.get("/category/trends", response_model=CategoryTrendResponse, response_class=ORJSONResponse)
 async def get_category_trends(ingredient: str = Query(..., description="Ingredient name")):
     try:
-        ingredient_pattern = f"'%{ingredient}%'"
+        # Normalize at entry so e.g. "Garlic" and "garlic " share one cache entry
+        ingredient = ingredient.strip().lower()
+        cache_key = ("category/trends", ingredient)
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return cached
         
-        years_query = f"""
-        SELECT DISTINCT year
-        FROM ingredient_details
-        WHERE year >= 2018
-            AND year <= EXTRACT(YEAR FROM CURRENT_DATE)
-        ORDER BY year ASC
-        LIMIT 7;
-        """
+        ingredient_pattern = f"%{ingredient}%"
         
-        category_trends_query = f"""
-        WITH yearly_category_totals AS (
-            SELECT 
-                year,
-                COALESCE(general_category, 'Other') AS category,
-                COUNT(DISTINCT dish_id) AS total_dishes
-            FROM ingredient_details
-            WHERE year >= 2018
-                AND year <= EXTRACT(YEAR FROM CURRENT_DATE)
-                AND general_category IS NOT NULL
-            GROUP BY year, general_category
-        ),
-        yearly_category_ingredient AS (
-            SELECT 
-                year,
-                COALESCE(general_category, 'Other') AS category,
-                COUNT(DISTINCT dish_id) AS ingredient_dishes
-            FROM ingredient_details
-            WHERE ingredient_name ILIKE {ingredient_pattern}
-                AND year >= 2018
-                AND year <= EXTRACT(YEAR FROM CURRENT_DATE)
-                AND general_category IS NOT NULL
-            GROUP BY year, general_category
+        trends_result = await execute_query(
+            CATEGORY_TRENDS_QUERY,
+            [ingredient_pattern],
+            options=QueryOptions(cacheable=True, ttl=3600000)
         )
-        SELECT 
-            yct.year,
-            yct.category AS name,
-            ROUND(
-                COALESCE(yci.ingredient_dishes, 0) * 100.0 / NULLIF(yct.total_dishes, 0), 
-                2
-            ) AS adoption_percentage
-        FROM yearly_category_totals yct
-        LEFT JOIN yearly_category_ingredient yci 
-            ON yct.year = yci.year AND yct.category = yci.category
-        ORDER BY yct.year ASC, adoption_percentage DESC;
-        """
         
-        # Execute queries
-        years_result, trends_result = await asyncio.gather(
-            execute_query(years_query, options=QueryOptions(cacheable=True, ttl=3600000)),
-            execute_query(category_trends_query, options=QueryOptions(cacheable=True, ttl=3600000))
-        )
-        
-        if not years_result["rows"] or not trends_result["rows"]:
+        if not trends_result["rows"]:
             raise HTTPException(status_code=404, detail=f"No category trends data found for ingredient: {ingredient}")
         
-        years = [int(row["year"]) for row in years_result["rows"]]
-        
-        # Process trend data by category
-        category_map = {}
+        # First 7 years present in the data
+        years = sorted({int(row["year"]) for row in trends_result["rows"]})[:7]
+        year_index = {year: i for i, year in enumerate(years)}
         
-        # Group data by category
+        # Group adoption percentages by category, one slot per year
+        category_map = defaultdict(lambda: [0.0] * len(years))
         for row in trends_result["rows"]:
-            category_name = str(row["name"])
-            if category_name not in category_map:
-                category_map[category_name] = {
-                    "name": category_name,
-                    "adoption_percentages": [0.0] * len(years)
-                }
-            
-            # Find the index for this year
-            year_index = years.index(int(row["year"])) if int(row["year"]) in years else -1
-            if year_index >= 0:
-                category_map[category_name]["adoption_percentages"][year_index] = float(row["adoption_percentage"] or 0.0)
-        
-        # Convert to list and take top 5 categories by total adoption
-        sorted_categories = sorted(
-            category_map.values(),
-            key=lambda x: sum(x["adoption_percentages"]),
-            reverse=True
-        )[:5]
+            i = year_index.get(row["year"])
+            if i is not None:
+                category_map[row["name"]][i] = row["adoption_percentage"] or 0.0
         
+        # Rows arrive grouped by the top 5 categories in rank order
         categories = [
-            CategoryTrend(
-                name=category["name"],
-                adoption_percentages=category["adoption_percentages"]
+            CategoryTrend.model_construct(
+                name=name,
+                adoption_percentages=adoption_percentages
             )
-            for category in sorted_categories
+            for name, adoption_percentages in category_map.items()
         ]
         
         # Generate analysis
@@ -132,7 +158,7 @@ async def get_category_trends(ingredient: str = Query(..., description="Ingredie
         insights = generate_category_insights(categories, years)
         summary = generate_summary(ingredient, categories, analysis)
         
-        return CategoryTrendResponse(
+        trends_response = CategoryTrendResponse(
             ingredient=ingredient,
             years=years,
             categories=categories,
@@ -140,11 +166,13 @@ async def get_category_trends(ingredient: str = Query(..., description="Ingredie
             insights=insights,
             summary=summary
         )
+        response_cache.set(cache_key, trends_response)
+        return trends_response
         
     except HTTPException:
         raise
-    except Exception as e:
-        print(f"Database query error: {e}")
+    except Exception:
+        logger.exception("Category trends query failed")
         raise HTTPException(status_code=500, detail="Failed to fetch category trends data")
 
 
@@ -162,45 +190,49 @@ def calculate_category_analysis(categories: List[CategoryTrend]) -> CategoryAnal
             avg_adoption_rate=0.0
         )
 
-    # Find top performer (highest current adoption)
-    top_performer = max(categories, key=lambda x: x.adoption_percentages[-1] if x.adoption_percentages else 0)
-    top_performer_rate = top_performer.adoption_percentages[-1] if top_performer.adoption_percentages else 0
-
-    # Find fastest growing (highest growth rate)
+    top_performer = categories[0]
+    top_performer_rate = -1.0
     fastest_growing = categories[0]
     fastest_growth_rate = 0.0
+    most_consistent = categories[0]
+    lowest_cv = float('inf')
+    adoption_total = 0.0
+    adoption_count = 0
 
+    # Single pass over the categories for every headline metric
     for category in categories:
         values = category.adoption_percentages
-        if len(values) > 1:
-            first_value = next((v for v in values if v > 0), 0)
-            last_value = values[-1] if values else 0
-            
-            if first_value > 0:
-                growth_rate = ((last_value - first_value) / first_value) * 100
-                if growth_rate > fastest_growth_rate:
-                    fastest_growth_rate = growth_rate
-                    fastest_growing = category
+        last_value = values[-1] if values else 0
 
-    # Find most consistent (lowest coefficient of variation)
-    most_consistent = categories[0]
-    lowest_cv = float('inf')
+        # Top performer (highest current adoption)
+        if last_value > top_performer_rate:
+            top_performer_rate = last_value
+            top_performer = category
 
-    for category in categories:
-        values = [v for v in category.adoption_percentages if v > 0]
-        if len(values) > 1:
-            mean_val = sum(values) / len(values)
-            if mean_val > 0:
-                std_dev = (sum((v - mean_val) ** 2 for v in values) / len(values)) ** 0.5
-                cv = std_dev / mean_val  # Coefficient of variation
-                
-                if cv < lowest_cv:
-                    lowest_cv = cv
-                    most_consistent = category
+        positive_values = [v for v in values if v > 0]
+        for v in positive_values:
+            adoption_total += v
+        adoption_count += len(positive_values)
+
+        # Fastest growing (highest growth rate from the first non-zero year)
+        if len(values) > 1 and positive_values:
+            first_value = positive_values[0]
+            growth_rate = ((last_value - first_value) / first_value) * 100
+            if growth_rate > fastest_growth_rate:
+                fastest_growth_rate = growth_rate
+                fastest_growing = category
+
+        # Most consistent (lowest coefficient of variation)
+        if len(positive_values) > 1:
+            mean_val = sum(positive_values) / len(positive_values)
+            std_dev = (sum((v - mean_val) ** 2 for v in positive_values) / len(positive_values)) ** 0.5
+            cv = std_dev / mean_val  # Coefficient of variation
+            
+            if cv < lowest_cv:
+                lowest_cv = cv
+                most_consistent = category
 
-    # Calculate average adoption rate
-    all_values = [v for cat in categories for v in cat.adoption_percentages if v > 0]
-    avg_adoption_rate = sum(all_values) / len(all_values) if all_values else 0.0
+    avg_adoption_rate = adoption_total / adoption_count if adoption_count else 0.0
 
     return CategoryAnalysis(
         top_performer=top_performer.name,
@@ -222,7 +254,7 @@ def generate_category_insights(categories: List[CategoryTrend], years: List[int]
         values = category.adoption_percentages
         
         if not values or len(values) < 2:
-            insights.append(CategoryInsight(
+            insights.append(CategoryInsight.model_construct(
                 category=category.name,
                 insight=f"Current adoption: {values[-1]:.1f}%" if values else "No data available",
                 growth_pattern="stable"
@@ -256,7 +288,7 @@ def generate_category_insights(categories: List[CategoryTrend], years: List[int]
             pattern = "stable"
             insight = f"Current adoption: {last_value:.1f}%"
         
-        insights.append(CategoryInsight(
+        insights.append(CategoryInsight.model_construct(
             category=category.name,
             insight=insight,
             growth_pattern=pattern
@@ -271,27 +303,22 @@ def generate_summary(ingredient: str, categories: List[CategoryTrend], analysis:
     if not categories:
         return f"No category trend data available for {ingredient}."
     
-    summary = f"{ingredient.title()} shows varied adoption across {analysis.total_categories} food service categories. "
-    
-    # Top performer insight
-    summary += f"{analysis.top_performer} leads with {analysis.top_performer_rate:.1f}% adoption, "
-    
-    # Growth insight
-    if analysis.fastest_growth_rate > 30:
-        summary += f"while {analysis.fastest_growing} demonstrates exceptional growth (+{analysis.fastest_growth_rate:.0f}%). "
-    elif analysis.fastest_growth_rate > 10:
-        summary += f"with {analysis.fastest_growing} showing solid growth (+{analysis.fastest_growth_rate:.0f}%). "
-    else:
-        summary += f"with generally stable category performance. "
-    
-    # Overall performance
-    if analysis.avg_adoption_rate > 10:
-        summary += f"The ingredient maintains strong market presence with {analysis.avg_adoption_rate:.1f}% average adoption "
-    elif analysis.avg_adoption_rate > 5:
-        summary += f"The ingredient shows moderate market presence with {analysis.avg_adoption_rate:.1f}% average adoption "
-    else:
-        summary += f"The ingredient has emerging market presence with {analysis.avg_adoption_rate:.1f}% average adoption "
-    
-    summary += f"across analyzed categories."
+    growth_template = next(
+        (template for threshold, template in GROWTH_SUMMARY_TEMPLATES if analysis.fastest_growth_rate > threshold),
+        DEFAULT_GROWTH_SUMMARY
+    )
+    presence_template = next(
+        (template for threshold, template in PRESENCE_SUMMARY_TEMPLATES if analysis.avg_adoption_rate > threshold),
+        DEFAULT_PRESENCE_SUMMARY
+    )
     
-    return summary
\ No newline at end of file
+    return "".join((
+        f"{ingredient.title()} shows varied adoption across {analysis.total_categories} food service categories. ",
+        # Top performer insight
+        f"{analysis.top_performer} leads with {analysis.top_performer_rate:.1f}% adoption, ",
+        # Growth insight
+        growth_template.format(name=analysis.fastest_growing, rate=analysis.fastest_growth_rate),
+        # Overall performance
+        presence_template.format(rate=analysis.avg_adoption_rate),
+        "across analyzed categories.",
+    ))
@@ -1,9 +1,13 @@
 # routers/consumer_insights_attributes.py
-from fastapi import APIRouter, HTTPException, Query
-from database.connection import execute_query, QueryOptions
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from database.connection import db_instance, execute_query, QueryOptions, response_cache
+from config import settings
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 from enum import Enum
+import hashlib
+import logging
+import time
 
 class AttributeType(str, Enum):
     flavor = "flavor"
@@ -28,54 +32,141 @@ class AttributeInsightsResponse(BaseModel):
     insights: Dict[str, Any]
     attribute_type: str
 
+# Years filled in with simulated values when an ingredient has no trend rows
+DEFAULT_TREND_YEARS = (2019, 2020, 2021, 2022)
+
+# Clients may reuse a response for as long as the query cache keeps its result
+ATTRIBUTE_INSIGHTS_CACHE_CONTROL = f"max-age={settings.default_cache_ttl // 1000}"
+
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
-# Mapping of attribute types to their table names and column names
-ATTRIBUTE_CONFIG = {
-    "flavor": {
-        "table": "ingredient_flavor",
-        "attribute_column": "flavor_attribute"
-    },
-    "texture": {
-        "table": "ingredient_texture", 
-        "attribute_column": "texture_attribute"
-    },
-    "aroma": {
-        "table": "ingredient_aroma",
-        "attribute_column": "aroma_attribute"
-    },
-    "diet": {
-        "table": "ingredient_diet",
-        "attribute_column": "diet_attribute"
-    },
-    "functional_health": {
-        "table": "ingredient_functional_health",
-        "attribute_column": "functional_health_attribute"
-    },
-    "occasions": {
-        "table": "ingredient_occasions",
-        "attribute_column": "occasion_attribute"
-    },
-    "convenience": {
-        "table": "ingredient_convenience",
-        "attribute_column": "convenience_attribute"
-    },
-    "social": {
-        "table": "ingredient_social",
-        "attribute_column": "social_attribute"
-    },
-    "emotional": {
-        "table": "ingredient_emotional",
-        "attribute_column": "emotional_attribute"
-    },
-    "cooking_technique": {
-        "table": "ingredient_cooking_technique",
-        "attribute_column": "cooking_technique_attribute"
-    }
-}
+# Distribution (top 6), trends for exactly those 6 and detailed attributes come
+# back from one round trip, split on the kind column; the filtered rows are
+# scanned once and shared by every branch. The lowercased ingredient pattern is
+# bound as $1 and matched against the distinct ingredient_names table, once per
+# name rather than once per attribute row. The optional year range is bound as
+# $2/$3 and narrows the distribution and detailed attributes but not the trends.
+# Every attribute type reads the combined ingredient_attribute table, selected
+# by $4, so all types share this one query text
+ATTRIBUTE_INSIGHTS_QUERY = """
+WITH matching AS (
+    SELECT 
+        attribute_value AS raw_attribute,
+        LOWER(TRIM(attribute_value)) AS attribute_name,
+        year,
+        star_rating
+    FROM ingredient_attribute
+    WHERE attribute_type = $4
+        AND ingredient_name IN (
+            SELECT ingredient_name
+            FROM ingredient_names
+            WHERE ingredient_name_lower LIKE $1
+        )
+),
+-- One aggregation over the in-period rows feeds both the distribution and the
+-- detailed attributes; the raw value determines its normalized name
+raw_attribute_counts AS (
+    SELECT 
+        raw_attribute,
+        attribute_name,
+        COUNT(*) as mention_count,
+        AVG(star_rating) as avg_rating
+    FROM matching
+    WHERE ($2::INTEGER IS NULL OR year >= $2)
+        AND ($3::INTEGER IS NULL OR year <= $3)
+    GROUP BY raw_attribute, attribute_name
+),
+attribute_counts AS (
+    SELECT 
+        attribute_name,
+        SUM(mention_count) as mention_count
+    FROM raw_attribute_counts
+    GROUP BY attribute_name
+),
+-- Top 6 by share; the percentage only rounds the mention count against a shared
+-- total, so ranking on the count keeps the same order
+distribution AS (
+    SELECT 
+        attribute_name,
+        mention_count,
+        ROUND(CAST((mention_count * 100.0 / COALESCE(NULLIF(SUM(mention_count) OVER (), 0), 1)) AS DECIMAL(10,1))) as percentage,
+        ROW_NUMBER() OVER (ORDER BY mention_count DESC, attribute_name) as rank
+    FROM attribute_counts
+    QUALIFY rank <= 6
+),
+attribute_yearly AS (
+    SELECT 
+        year,
+        attribute_name,
+        COUNT(*) as count
+    FROM matching
+    WHERE year BETWEEN 1900 AND 2030
+        AND attribute_name IN (SELECT attribute_name FROM distribution)
+    GROUP BY year, attribute_name
+),
+yearly_totals AS (
+    SELECT 
+        year,
+        SUM(count) as total_count
+    FROM attribute_yearly
+    GROUP BY year
+),
+detailed AS (
+    SELECT 
+        raw_attribute,
+        mention_count,
+        avg_rating,
+        ROW_NUMBER() OVER (ORDER BY mention_count DESC, raw_attribute) as rank
+    FROM raw_attribute_counts
+    QUALIFY rank <= 10
+)
+SELECT 
+    'distribution' AS kind,
+    rank AS position,
+    NULL AS year,
+    attribute_name,
+    percentage,
+    mention_count,
+    NULL AS avg_rating,
+    NULL AS percentages
+FROM distribution
+UNION ALL
+SELECT 
+    'trends' AS kind,
+    ay.year AS position,
+    CAST(ay.year AS VARCHAR) AS year,
+    NULL AS attribute_name,
+    NULL AS percentage,
+    NULL AS mention_count,
+    NULL AS avg_rating,
+    -- One row per year, pivoted to an attribute -> percentage map
+    MAP(
+        LIST(ay.attribute_name ORDER BY ay.attribute_name),
+        LIST(CAST(ROUND(CAST((ay.count * 100.0 / COALESCE(NULLIF(yt.total_count, 0), 1)) AS DECIMAL(10,1))) AS DOUBLE) ORDER BY ay.attribute_name)
+    ) AS percentages
+FROM attribute_yearly ay
+JOIN yearly_totals yt ON ay.year = yt.year
+GROUP BY ay.year
+UNION ALL
+SELECT 
+    'detailed' AS kind,
+    rank AS position,
+    NULL AS year,
+    raw_attribute AS attribute_name,
+    NULL AS percentage,
+    mention_count,
+    avg_rating,
+    NULL AS percentages
+FROM detailed
+ORDER BY kind, position;
+"""
 
 @router.get("/consumer-insights/{attribute_type}", response_model=AttributeInsightsResponse)
 async def get_attribute_insights(
+    request: Request,
+    response: Response,
     attribute_type: AttributeType,
     ingredient: str = Query(..., description="Ingredient name"),
     start_year: Optional[int] = Query(None, description="Start year for trend analysis"),
@@ -84,224 +175,112 @@ async def get_attribute_insights(
     """
     Generic endpoint for getting consumer insights for any attribute type.
     
-    Supported attribute_types:
-    - flavor: Get flavor insights from ingredient_flavor table
-    - texture: Get texture insights from ingredient_texture table
-    - aroma: Get aroma insights from ingredient_aroma table
-    - visual: Get visual insights from ingredient_visual table
+    Supported attribute_types are the AttributeType values (flavor, texture,
+    aroma, diet, ...). Each reads its rows from the combined ingredient_attribute
+    table, which is built from the matching ingredient_<attribute> table.
     """
     
-    # Get configuration for the attribute type
-    if attribute_type not in ATTRIBUTE_CONFIG:
-        raise HTTPException(
-            status_code=400, 
-            detail=f"Unsupported attribute type: {attribute_type}. Supported types: {list(ATTRIBUTE_CONFIG.keys())}"
-        )
-    
-    config = ATTRIBUTE_CONFIG[attribute_type]
-    table_name = config["table"]
-    attribute_column = config["attribute_column"]
-    
     try:
-        # Get current distribution AND determine top 6 attributes
-        current_distribution_query = f"""
-        WITH attribute_counts AS (
-            SELECT 
-                LOWER(TRIM({attribute_column})) as attribute_name,
-                COUNT(*) as mention_count,
-                AVG(star_rating) as avg_rating,
-                SUM(num_ratings) as total_ratings,
-                SUM(num_reviews) as total_reviews
-            FROM {table_name}
-            WHERE ingredient_name ILIKE '%{ingredient}%'
-                AND {attribute_column} IS NOT NULL
-                AND LENGTH(TRIM({attribute_column})) > 0
-            GROUP BY LOWER(TRIM({attribute_column}))
-        ),
-        total_mentions AS (
-            SELECT SUM(mention_count) as total_count
-            FROM attribute_counts
+        # Normalize at entry so e.g. "Garlic" and "garlic " share one cache entry
+        ingredient = ingredient.strip()
+        cache_key = (
+            "consumer-insights",
+            attribute_type.value,
+            ingredient.lower(),
+            start_year or None,
+            end_year or None
         )
-        SELECT 
-            CONCAT(UPPER(SUBSTR(ac.attribute_name, 1, 1)), LOWER(SUBSTR(ac.attribute_name, 2))) as name,
-            ac.attribute_name as raw_name,
-            ROUND(CAST((ac.mention_count * 100.0 / COALESCE(NULLIF(tm.total_count, 0), 1)) AS DECIMAL(10,1))) as percentage,
-            ac.mention_count,
-            ROUND(CAST(ac.avg_rating AS DECIMAL(10,2))) as avg_rating,
-            ac.total_ratings,
-            ac.total_reviews
-        FROM attribute_counts ac
-        CROSS JOIN total_mentions tm
-        ORDER BY percentage DESC
-        LIMIT 6;
-        """
         
-        # Execute distribution query first to get the definitive top 6
-        distribution_result = await execute_query(
-            current_distribution_query,
-            options=QueryOptions(cacheable=True, ttl=3600000)
-        )
-        
-        # Extract the top 6 attribute names for use in trends query
-        top_6_attribute_names = []
-        if distribution_result["rows"]:
-            top_6_attribute_names = [row["raw_name"] for row in distribution_result["rows"]]
-        
-        # Build trends query using the exact top 6 attributes from distribution
-        if top_6_attribute_names:
-            # Create a comma-separated list of quoted attribute names for SQL IN clause
-            attribute_names_sql = "', '".join(top_6_attribute_names)
-            attribute_names_sql = f"'{attribute_names_sql}'"
-            
-            trends_query = f"""
-            WITH attribute_yearly AS (
-                SELECT 
-                    TRY_CAST(year AS INTEGER) as year,
-                    LOWER(TRIM({attribute_column})) as attribute_name,
-                    COUNT(*) as count
-                FROM {table_name}
-                WHERE ingredient_name ILIKE '%{ingredient}%'
-                    AND {attribute_column} IS NOT NULL
-                    AND LENGTH(TRIM({attribute_column})) > 0
-                    AND year IS NOT NULL
-                    AND TRY_CAST(year AS INTEGER) IS NOT NULL
-                    AND TRY_CAST(year AS INTEGER) BETWEEN 1900 AND 2030
-                    AND LOWER(TRIM({attribute_column})) IN ({attribute_names_sql})
-                GROUP BY TRY_CAST(year AS INTEGER), LOWER(TRIM({attribute_column}))
-            ),
-            yearly_totals AS (
-                SELECT 
-                    year,
-                    SUM(count) as total_count
-                FROM attribute_yearly
-                WHERE year IS NOT NULL
-                GROUP BY year
-            )
-            SELECT 
-                CAST(ay.year AS VARCHAR) as year,
-                CONCAT(UPPER(SUBSTR(ay.attribute_name, 1, 1)), LOWER(SUBSTR(ay.attribute_name, 2))) as attribute_name,
-                ROUND(CAST((ay.count * 100.0 / COALESCE(NULLIF(yt.total_count, 0), 1)) AS DECIMAL(10,1))) as percentage
-            FROM attribute_yearly ay
-            JOIN yearly_totals yt ON ay.year = yt.year
-            WHERE ay.year IS NOT NULL
-            ORDER BY ay.year, ay.attribute_name;
-            """
-        else:
-            # Fallback if no distribution data
-            trends_query = "SELECT '' as year, '' as attribute_name, 0 as percentage WHERE 1=0"
+        # The underlying query results are cached for default_cache_ttl, so the
+        # ETag names the request arguments within that window and the current
+        # cache generation; a client revalidating inside it gets a 304 before
+        # any cache or query work, and clearing the caches invalidates it
+        etag = attribute_insights_etag(cache_key)
+        cache_headers = {"ETag": etag, "Cache-Control": ATTRIBUTE_INSIGHTS_CACHE_CONTROL}
+        if_none_match = parse_if_none_match(request.headers.get("if-none-match"))
+        if etag in if_none_match or "*" in if_none_match:
+            return Response(status_code=304, headers=cache_headers)
+        response.headers.update(cache_headers)
         
-        # Get detailed attributes for insights
-        detailed_attributes_query = f"""
-        SELECT 
-            {attribute_column},
-            COUNT(*) as mention_count,
-            AVG(star_rating) as avg_rating,
-            AVG(num_ratings) as avg_num_ratings
-        FROM {table_name}
-        WHERE ingredient_name ILIKE '%{ingredient}%'
-            AND {attribute_column} IS NOT NULL
-            AND LENGTH(TRIM({attribute_column})) > 0
-        GROUP BY {attribute_column}
-        ORDER BY mention_count DESC
-        LIMIT 10;
-        """
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return cached
         
-        # Add year filtering if provided
-        year_filter = ""
-        if start_year and end_year:
-            year_filter = f" AND TRY_CAST(year AS INTEGER) BETWEEN {start_year} AND {end_year}"
-        elif start_year:
-            year_filter = f" AND TRY_CAST(year AS INTEGER) >= {start_year}"
-        elif end_year:
-            year_filter = f" AND TRY_CAST(year AS INTEGER) <= {end_year}"
+        params = [f"%{ingredient.lower()}%", start_year or None, end_year or None, attribute_type.value]
         
-        # Apply year filters to queries if specified
-        if year_filter:
-            current_distribution_query = current_distribution_query.replace(
-                f"FROM {table_name}",
-                f"FROM {table_name}"
-            ).replace(
-                f"WHERE ingredient_name ILIKE '%{ingredient}%'",
-                f"WHERE ingredient_name ILIKE '%{ingredient}%'{year_filter}"
-            )
-            
-            detailed_attributes_query = detailed_attributes_query.replace(
-                f"WHERE ingredient_name ILIKE '%{ingredient}%'",
-                f"WHERE ingredient_name ILIKE '%{ingredient}%'{year_filter}"
-            )
-        
-        # Execute queries
-        trends_result = await execute_query(
-            trends_query, 
+        result = await execute_query(
+            ATTRIBUTE_INSIGHTS_QUERY,
+            params,
             options=QueryOptions(cacheable=True, ttl=3600000)
         )
         
-        attributes_result = await execute_query(
-            detailed_attributes_query,
-            options=QueryOptions(cacheable=True, ttl=3600000)
-        )
+        distribution_rows = []
+        trend_rows = []
+        detailed_rows = []
+        for row in result["rows"]:
+            if row["kind"] == "distribution":
+                distribution_rows.append(row)
+            elif row["kind"] == "trends":
+                trend_rows.append(row)
+            else:
+                detailed_rows.append(row)
         
-        # Process attributes data
-        attributes = []
-        if distribution_result["rows"]:
-            for row in distribution_result["rows"]:
-                name = str(row["name"])
-                percentage = float(row["percentage"]) if row["percentage"] is not None else 0.0
-                attributes.append(Attribute(
-                    name=name,
-                    value=percentage
-                ))
+        # Attribute names arrive lowercased; capitalize each of the (at most six)
+        # distinct names once and reuse them for the distribution and the trends
+        display_names = {
+            row["attribute_name"]: row["attribute_name"][:1].upper() + row["attribute_name"][1:]
+            for row in distribution_rows
+        }
         
-        # Process trends data
-        trends = []
-        if trends_result["rows"]:
-            # Group by year
-            year_data = {}
-            for row in trends_result["rows"]:
-                year = str(row["year"])
-                attribute_name = str(row["attribute_name"])
-                percentage = float(row["percentage"]) if row["percentage"] is not None else 0.0
-                
-                if year not in year_data:
-                    year_data[year] = {"year": year}
-                
-                year_data[year][attribute_name] = percentage
-            
-            # Convert to list
-            trends = list(year_data.values())
-            trends.sort(key=lambda x: x["year"])
+        # Process attributes data; rows come from our own query, so skip validation
+        attributes = [
+            Attribute.model_construct(
+                name=display_names[row["attribute_name"]],
+                value=float(row["percentage"]) if row["percentage"] is not None else 0.0
+            )
+            for row in distribution_rows
+        ]
+        
+        # Trend rows arrive one per year in numeric order, already pivoted
+        trends = [
+            {"year": row["year"], **{display_names[name]: percentage for name, percentage in row["percentages"].items()}}
+            for row in trend_rows
+        ]
         
-        # Generate default trend data if none exists
+        # Generate default trend data if none exists: the top 3 attributes from the
+        # current distribution with a small simulated growth per year
         if not trends and attributes:
-            years = ['2019', '2020', '2021', '2022']
-            for year in years:
-                trend_data = {"year": year}
-                # Use top 3 attributes from current distribution
-                for i, attr in enumerate(attributes[:3]):
-                    # Simulate some variation over time
-                    base_value = attr.value
-                    variation = (int(year) - 2019) * 2  # Small growth over time
-                    trend_data[attr.name] = round(max(base_value + variation, 0), 1)
-                trends.append(trend_data)
+            trends = [
+                {
+                    "year": str(year),
+                    **{
+                        attr.name: round(max(attr.value + (year - DEFAULT_TREND_YEARS[0]) * 2, 0), 1)
+                        for attr in attributes[:3]
+                    }
+                }
+                for year in DEFAULT_TREND_YEARS
+            ]
         
         # Generate insights
         insights = generate_attribute_insights(
             attributes, 
             trends, 
-            attributes_result["rows"] if attributes_result["rows"] else [],
+            detailed_rows,
             ingredient,
             attribute_type
         )
         
-        return AttributeInsightsResponse(
+        insights_response = AttributeInsightsResponse(
             attributes=attributes,
             trends=trends,
             insights=insights,
             attribute_type=attribute_type
         )
+        response_cache.set(cache_key, insights_response)
+        return insights_response
         
-    except Exception as e:
-        print(f"Database query error: {e}")
+    except Exception:
+        logger.exception("Consumer insights query failed for %s", attribute_type.value)
         raise HTTPException(status_code=500, detail=f"Failed to fetch {attribute_type} insights data")
 
 def generate_attribute_insights(attributes, trends, raw_attributes, ingredient, attribute_type):
@@ -325,12 +304,12 @@ def generate_attribute_insights(attributes, trends, raw_attributes, ingredient,
             first_year = trends[0]
             last_year = trends[-1]
             
-            # Calculate growth rates for available attributes
-            growth_rates = {}
-            for key in first_year.keys():
-                if key != "year" and first_year.get(key, 0) > 0:
-                    growth = ((last_year.get(key, 0) - first_year.get(key, 0)) / first_year.get(key, 1)) * 100
-                    growth_rates[key] = growth
+            # Growth from the first to the last year for each attribute present in the first year
+            growth_rates = {
+                key: (last_year.get(key, 0) - value) / value * 100
+                for key, value in first_year.items()
+                if key != "year" and value > 0
+            }
             
             # Find growing and declining trends
             if growth_rates:
@@ -344,14 +323,27 @@ def generate_attribute_insights(attributes, trends, raw_attributes, ingredient,
     
     # Process raw attributes
     if raw_attributes:
-        attribute_column_name = ATTRIBUTE_CONFIG[attribute_type]["attribute_column"]
         insights["key_attributes"] = [
             {
-                "attribute": row[attribute_column_name],
+                "attribute": row["attribute_name"],
                 "mentions": int(row["mention_count"]),
                 "avg_rating": round(float(row["avg_rating"]), 2) if row["avg_rating"] else 0.0
             }
             for row in raw_attributes[:5]  # Top 5
         ]
     
-    return insights
\ No newline at end of file
+    return insights
+
+
+def attribute_insights_etag(cache_key) -> str:
+    """Build an ETag from the request arguments, the query cache window and the cache generation"""
+    window = int(time.time() * 1000) // settings.default_cache_ttl
+    state = (cache_key, window, db_instance.cache_generation)
+    digest = hashlib.blake2b(repr(state).encode(), digest_size=8).hexdigest()
+    return f'"{digest}"'
+
+def parse_if_none_match(header: Optional[str]) -> List[str]:
+    """Return the entity tags listed in an If-None-Match header, with weak prefixes dropped"""
+    if not header:
+        return []
+    return [tag.strip().removeprefix("W/") for tag in header.split(",")]
@@ -4,6 +4,7 @@ from database.connection import execute_query, QueryOptions
 from pydantic import BaseModel
 from typing import List, Optional
 from config import CURRENT_YEAR  # Import CURRENT_YEAR from config
+import logging
 
 class CuisineData(BaseModel):
     cuisine: str
@@ -35,100 +36,83 @@ class CuisineAnalysisResponse(BaseModel):
     emerging_cuisines: List[CuisineData]
     avg_growth_rate: float
 
+PREVIOUS_YEAR = CURRENT_YEAR - 1
+
+# Single comprehensive query for all cuisine analysis data. Years are
+# process-constant and baked in at import; the lowercased ingredient pattern is
+# bound as $1
+CUISINE_ANALYSIS_QUERY = f"""
+WITH matching_names AS (
+    -- Resolve the pattern once per distinct name instead of once per row
+    SELECT ingredient_name
+    FROM ingredient_names
+    WHERE ingredient_name_lower LIKE $1
+),
+ingredient_counts AS (
+    -- One pass over the ingredient rows: overall and per-year dishes by cuisine.
+    -- cuisine is a dish attribute, so the per-cuisine distinct counts sum to
+    -- the total ingredient dishes used for the percentage
+    SELECT 
+        cuisine,
+        COUNT(DISTINCT dish_id) AS total_dish_count,
+        COUNT(DISTINCT dish_id) FILTER (WHERE year = {PREVIOUS_YEAR}) AS count_previous,
+        COUNT(DISTINCT dish_id) FILTER (WHERE year = {CURRENT_YEAR}) AS count_current,
+        SUM(COUNT(DISTINCT dish_id)) OVER () AS total_count
+    FROM ingredient_details
+    WHERE ingredient_name IN (SELECT ingredient_name FROM matching_names)
+        AND cuisine IS NOT NULL
+        AND cuisine != ''
+    GROUP BY cuisine
+),
+cuisine_totals AS (
+    -- Ingredient-independent totals from the precomputed cuisine_year_totals table
+    SELECT 
+        cuisine,
+        SUM(dish_count) AS total_cuisine_dishes,
+        COALESCE(SUM(dish_count) FILTER (WHERE year = {PREVIOUS_YEAR}), 0) AS total_cuisine_dishes_previous,
+        COALESCE(SUM(dish_count) FILTER (WHERE year = {CURRENT_YEAR}), 0) AS total_cuisine_dishes_current
+    FROM cuisine_year_totals
+    GROUP BY cuisine
+)
+SELECT 
+    ic.cuisine,
+    ic.total_dish_count as dish_count,
+    ROUND(ic.total_dish_count * 100.0 / NULLIF(ic.total_count, 0), 1) as percentage,
+    ROUND(ic.count_current * 100.0 / NULLIF(ct.total_cuisine_dishes_current, 0), 1) as current_penetration,
+    ROUND(ic.count_previous * 100.0 / NULLIF(ct.total_cuisine_dishes_previous, 0), 1) as previous_penetration,
+    CASE 
+        WHEN ic.count_previous = 0 OR ic.count_previous IS NULL OR ct.total_cuisine_dishes_previous = 0 THEN 
+            CASE 
+                WHEN ic.count_current > 0 AND ct.total_cuisine_dishes_current > 0 THEN 100.0
+                ELSE 0.0
+            END
+        ELSE ROUND(((ic.count_current * 100.0 / NULLIF(ct.total_cuisine_dishes_current, 0)) - 
+                   (ic.count_previous * 100.0 / NULLIF(ct.total_cuisine_dishes_previous, 0))) * 
+                   100.0 / NULLIF((ic.count_previous * 100.0 / NULLIF(ct.total_cuisine_dishes_previous, 0)), 0), 1)
+    END as growth_rate,
+    ROUND(ic.total_dish_count * 100.0 / NULLIF(ct.total_cuisine_dishes, 0), 1) as penetration_rate,
+    ic.count_current,
+    ic.count_previous
+FROM ingredient_counts ic
+LEFT JOIN cuisine_totals ct ON ic.cuisine = ct.cuisine
+WHERE ic.total_dish_count >= 2  -- Filter out cuisines with very few dishes
+ORDER BY ic.total_dish_count DESC;
+"""
+
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 @router.get("/cuisine/analysis", response_model=CuisineAnalysisResponse)
 async def get_cuisine_analysis(ingredient: str = Query(..., description="Ingredient name")):
     try:
-        ingredient_pattern = f"'%{ingredient}%'"
-        previous_year = CURRENT_YEAR - 1
-        
-        # Single comprehensive query for all cuisine analysis data
-        cuisine_analysis_query = f"""
-        WITH overall_cuisine_counts AS (
-            -- Overall distribution across all years
-            SELECT 
-                cuisine,
-                COUNT(DISTINCT dish_id) AS total_dish_count,
-                AVG(star_rating) as avg_rating
-            FROM ingredient_details
-            WHERE ingredient_name ILIKE {ingredient_pattern}
-                AND cuisine IS NOT NULL
-                AND cuisine != ''
-            GROUP BY cuisine
-        ),
-        growth_counts AS (
-            -- Growth calculation: previous year vs current year
-            SELECT 
-                cuisine,
-                COUNT(DISTINCT CASE WHEN year = {previous_year} THEN dish_id END) AS count_previous,
-                COUNT(DISTINCT CASE WHEN year = {CURRENT_YEAR} THEN dish_id END) AS count_current
-            FROM ingredient_details
-            WHERE ingredient_name ILIKE {ingredient_pattern}
-                AND cuisine IS NOT NULL
-                AND cuisine != ''
-            GROUP BY cuisine
-        ),
-        total_ingredient_dishes AS (
-            -- Total ingredient dishes across all cuisines for percentage calculation
-            SELECT COUNT(DISTINCT dish_id) AS total_count
-            FROM ingredient_details
-            WHERE ingredient_name ILIKE {ingredient_pattern}
-                AND cuisine IS NOT NULL
-                AND cuisine != ''
-        ),
-        cuisine_totals AS (
-            -- Total dishes per cuisine (all ingredients) for penetration calculation
-            SELECT 
-                cuisine,
-                COUNT(DISTINCT dish_id) as total_cuisine_dishes
-            FROM ingredient_details
-            WHERE cuisine IS NOT NULL
-                AND cuisine != ''
-            GROUP BY cuisine
-        ),
-        cuisine_totals_by_year AS (
-            -- Total dishes per cuisine by year for year-over-year penetration
-            SELECT 
-                cuisine,
-                COUNT(DISTINCT CASE WHEN year = {previous_year} THEN dish_id END) as total_cuisine_dishes_previous,
-                COUNT(DISTINCT CASE WHEN year = {CURRENT_YEAR} THEN dish_id END) as total_cuisine_dishes_current
-            FROM ingredient_details
-            WHERE cuisine IS NOT NULL
-                AND cuisine != ''
-            GROUP BY cuisine
-        )
-        SELECT 
-            occ.cuisine,
-            occ.total_dish_count as dish_count,
-            ROUND(occ.total_dish_count * 100.0 / NULLIF(tid.total_count, 0), 1) as percentage,
-            ROUND(gc.count_current * 100.0 / NULLIF(cty.total_cuisine_dishes_current, 0), 1) as current_penetration,
-            ROUND(gc.count_previous * 100.0 / NULLIF(cty.total_cuisine_dishes_previous, 0), 1) as previous_penetration,
-            CASE 
-                WHEN gc.count_previous = 0 OR gc.count_previous IS NULL OR cty.total_cuisine_dishes_previous = 0 THEN 
-                    CASE 
-                        WHEN gc.count_current > 0 AND cty.total_cuisine_dishes_current > 0 THEN 100.0
-                        ELSE 0.0
-                    END
-                ELSE ROUND(((gc.count_current * 100.0 / NULLIF(cty.total_cuisine_dishes_current, 0)) - 
-                           (gc.count_previous * 100.0 / NULLIF(cty.total_cuisine_dishes_previous, 0))) * 
-                           100.0 / NULLIF((gc.count_previous * 100.0 / NULLIF(cty.total_cuisine_dishes_previous, 0)), 0), 1)
-            END as growth_rate,
-            ROUND(occ.total_dish_count * 100.0 / NULLIF(ct.total_cuisine_dishes, 0), 1) as penetration_rate,
-            occ.avg_rating,
-            COALESCE(gc.count_current, 0) as count_current,
-            COALESCE(gc.count_previous, 0) as count_previous
-        FROM overall_cuisine_counts occ
-        LEFT JOIN growth_counts gc ON occ.cuisine = gc.cuisine
-        LEFT JOIN cuisine_totals ct ON occ.cuisine = ct.cuisine
-        LEFT JOIN cuisine_totals_by_year cty ON occ.cuisine = cty.cuisine
-        CROSS JOIN total_ingredient_dishes tid
-        WHERE occ.total_dish_count >= 2  -- Filter out cuisines with very few dishes
-        ORDER BY occ.total_dish_count DESC;
-        """
+        # Normalize at entry so e.g. "garlic " matches the same names as "garlic"
+        ingredient = ingredient.strip()
+        ingredient_pattern = f"%{ingredient.lower()}%"
         
         result = await execute_query(
-            cuisine_analysis_query,
+            CUISINE_ANALYSIS_QUERY,
+            [ingredient_pattern],
             options=QueryOptions(cacheable=True, ttl=3600000)
         )
         
@@ -149,8 +133,8 @@ async def get_cuisine_analysis(ingredient: str = Query(..., description="Ingredi
                 )
                 cuisine_data.append(cuisine)
                 
-            except Exception as e:
-                print(f"Error processing cuisine row {row}: {e}")
+            except Exception:
+                logger.exception("Skipping invalid cuisine row %s", row)
                 continue
         
         if not cuisine_data:
@@ -230,6 +214,6 @@ async def get_cuisine_analysis(ingredient: str = Query(..., description="Ingredi
         
     except HTTPException:
         raise
-    except Exception as e:
-        print(f"Database query error: {e}")
+    except Exception:
+        logger.exception("Cuisine analysis query failed")
         raise HTTPException(status_code=500, detail="Failed to fetch cuisine analysis data")
\ No newline at end of file
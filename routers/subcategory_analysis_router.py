@@ -3,11 +3,28 @@ from fastapi import APIRouter, HTTPException, Query
 from database.connection import execute_query, QueryOptions
 from pydantic import BaseModel
 from typing import List, Optional
+import logging
 
 class SubcategoryDistribution(BaseModel):
     subcategory: str
     percentage_of_total: float
 
+# Compiled once at import; the ingredient pattern is bound as $1 and the optional
+# category pattern as $2 (NULL disables the category filter)
+SUBCATEGORY_DISTRIBUTION_QUERY = """
+SELECT
+    specific_category AS subcategory,
+    ROUND(COUNT(*) * 100.0 / SUM(COUNT(*)) OVER (), 2) AS percentage_of_total
+FROM ingredient_details
+WHERE ingredient_name ILIKE $1
+    AND specific_category IS NOT NULL
+    AND specific_category != ''
+    AND ($2::VARCHAR IS NULL OR general_category ILIKE $2)
+GROUP BY specific_category
+ORDER BY percentage_of_total DESC;
+"""
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -17,31 +34,14 @@ async def get_subcategory_distribution(
     category: Optional[str] = Query(None, description="Filter by category")
 ):
     try:
-        # Fix the string formatting for DuckDB
-        category_filter = f"AND general_category ILIKE '%{category}%'" if category else ""
-        
-        subcategory_distribution_query = f"""
-        SELECT 
-            specific_category AS subcategory,
-            ROUND(COUNT(*) * 100.0 / SUM(COUNT(*)) OVER (), 2) AS percentage_of_total
-        FROM ingredient_details
-        WHERE ingredient_name ILIKE '%{ingredient}%'
-            AND specific_category IS NOT NULL
-            AND specific_category != ''
-            {category_filter}
-        GROUP BY specific_category
-        ORDER BY percentage_of_total DESC;
-        """
-        
-        print(f"Executing query: {subcategory_distribution_query}")  # Debug log
+        params = [f"%{ingredient}%", f"%{category}%" if category else None]
         
         result = await execute_query(
-            subcategory_distribution_query,
+            SUBCATEGORY_DISTRIBUTION_QUERY,
+            params,
             options=QueryOptions(cacheable=True, ttl=3600000)
         )
         
-        print(f"Distribution query result: {result}")  # Debug log
-        
         if result and "rows" in result and result["rows"]:
             subcategories = []
             for row in result["rows"]:
@@ -54,7 +54,6 @@ async def get_subcategory_distribution(
         
         return []
         
-    except Exception as e:
-        print(f"Database query error: {e}")
-        print(f"Query was: {subcategory_distribution_query}")
+    except Exception:
+        logger.exception("Subcategory distribution query failed")
         raise HTTPException(status_code=500, detail="Failed to fetch subcategory distribution data")
\ No newline at end of file
@@ -32,7 +32,140 @@ SELECT
     EXTRACT(QUARTER FROM d.date_created) AS quarter
 FROM dish_ingredients di
 JOIN dishes d
-  ON di.dish_id = d.dish_id;
+  ON di.dish_id = d.dish_id
+-- Clustered so each row group covers a narrow range of ingredient names and,
+-- within them, categories and years; the per-row-group min/max zonemaps then
+-- let scans filtered on the matching ingredient names skip most of the table
+ORDER BY ingredient_name, general_category, year;
+
+
+-- Per-category yearly dish totals. These do not depend on the ingredient, so
+-- they are rebuilt after each data load instead of being aggregated over
+-- ingredient_details on every category analysis request. dishes has one row
+-- per dish, so a plain COUNT(*) replaces COUNT(DISTINCT dish_id) over the
+-- per-ingredient rows; the EXISTS keeps the same dish set as ingredient_details.
+CREATE OR REPLACE TABLE category_year_totals AS
+SELECT
+    d.general_category,
+    EXTRACT(YEAR FROM d.date_created) AS year,
+    COUNT(*) AS dish_count
+FROM dishes d
+WHERE d.general_category IS NOT NULL
+    AND EXISTS (SELECT 1 FROM dish_ingredients di WHERE di.dish_id = d.dish_id)
+GROUP BY d.general_category, EXTRACT(YEAR FROM d.date_created);
+
+
+-- Per-cuisine yearly dish totals, the penetration denominators for cuisine
+-- analysis. Like category_year_totals they do not depend on the ingredient, so
+-- they are rebuilt after each data load rather than aggregated over every
+-- ingredient_details row per request; summing the years gives the all-time
+-- cuisine total since each dish has a single date.
+CREATE OR REPLACE TABLE cuisine_year_totals AS
+SELECT
+    d.cuisine,
+    EXTRACT(YEAR FROM d.date_created) AS year,
+    COUNT(*) AS dish_count
+FROM dishes d
+WHERE d.cuisine IS NOT NULL
+    AND d.cuisine != ''
+    AND EXISTS (SELECT 1 FROM dish_ingredients di WHERE di.dish_id = d.dish_id)
+GROUP BY d.cuisine, EXTRACT(YEAR FROM d.date_created);
+
+
+-- Per-category ingredient_details row counts, the penetration denominator for
+-- the category penetration endpoint. Ingredient-independent, so rebuilt after
+-- each data load rather than aggregated over the full table per request.
+CREATE OR REPLACE TABLE category_totals AS
+SELECT
+    general_category,
+    COUNT(*) AS total_count
+FROM ingredient_details
+WHERE general_category IS NOT NULL
+GROUP BY general_category;
+
+
+-- Distinct ingredient names. '%...%' patterns are matched against this small
+-- table first and the result is semi-joined to ingredient_details, so the
+-- pattern is evaluated once per name rather than once per row. The lowercased
+-- name is stored so lookups can use a plain LIKE with a lowercased pattern
+-- instead of case-folding every name inside ILIKE.
+CREATE OR REPLACE TABLE ingredient_names AS
+SELECT DISTINCT
+    ingredient_name,
+    lower(ingredient_name) AS ingredient_name_lower
+FROM ingredient_details
+WHERE ingredient_name IS NOT NULL;
+
+
+-- Per-(ingredient, category, year) roll-up of ingredient_details, rebuilt after
+-- each data load. The category endpoints resolve their pattern against the few
+-- rows per ingredient here instead of scanning ingredient_details. row_count
+-- sums exactly across matching names for row-based counts; dish ids are kept
+-- rather than a per-name dish count so dishes that list several matching names
+-- (e.g. 'garlic' and 'garlic powder') are counted once. Rows without a category
+-- are kept for queries whose totals include them.
+CREATE OR REPLACE TABLE ingredient_category_yearly AS
+SELECT
+    lower(ingredient_name) AS ingredient_name_lower,
+    general_category,
+    year,
+    COUNT(*) AS row_count,
+    LIST(DISTINCT dish_id) AS dish_ids
+FROM ingredient_details
+WHERE ingredient_name IS NOT NULL
+GROUP BY lower(ingredient_name), general_category, year
+ORDER BY ingredient_name_lower, general_category, year;
+
+
+-- All consumer insight attributes in one table, rebuilt after each data load.
+-- The ten ingredient_<attribute> tables share one shape, so the consumer
+-- insights endpoint reads this table with the attribute type as a bound
+-- parameter instead of one query per source table. The year is cast to INTEGER
+-- once here, and rows are clustered by attribute type and ingredient name so a
+-- request only touches the row groups for its type and matching names.
+CREATE OR REPLACE TABLE ingredient_attribute AS
+SELECT
+    attribute_type,
+    ingredient_name,
+    attribute_value,
+    TRY_CAST(year AS INTEGER) AS year,
+    star_rating,
+    num_ratings,
+    num_reviews
+FROM (
+    SELECT 'flavor' AS attribute_type, ingredient_name, flavor_attribute AS attribute_value, year, star_rating, num_ratings, num_reviews
+    FROM ingredient_flavor
+    UNION ALL
+    SELECT 'texture' AS attribute_type, ingredient_name, texture_attribute AS attribute_value, year, star_rating, num_ratings, num_reviews
+    FROM ingredient_texture
+    UNION ALL
+    SELECT 'aroma' AS attribute_type, ingredient_name, aroma_attribute AS attribute_value, year, star_rating, num_ratings, num_reviews
+    FROM ingredient_aroma
+    UNION ALL
+    SELECT 'diet' AS attribute_type, ingredient_name, diet_attribute AS attribute_value, year, star_rating, num_ratings, num_reviews
+    FROM ingredient_diet
+    UNION ALL
+    SELECT 'functional_health' AS attribute_type, ingredient_name, functional_health_attribute AS attribute_value, year, star_rating, num_ratings, num_reviews
+    FROM ingredient_functional_health
+    UNION ALL
+    SELECT 'occasions' AS attribute_type, ingredient_name, occasion_attribute AS attribute_value, year, star_rating, num_ratings, num_reviews
+    FROM ingredient_occasions
+    UNION ALL
+    SELECT 'convenience' AS attribute_type, ingredient_name, convenience_attribute AS attribute_value, year, star_rating, num_ratings, num_reviews
+    FROM ingredient_convenience
+    UNION ALL
+    SELECT 'social' AS attribute_type, ingredient_name, social_attribute AS attribute_value, year, star_rating, num_ratings, num_reviews
+    FROM ingredient_social
+    UNION ALL
+    SELECT 'emotional' AS attribute_type, ingredient_name, emotional_attribute AS attribute_value, year, star_rating, num_ratings, num_reviews
+    FROM ingredient_emotional
+    UNION ALL
+    SELECT 'cooking_technique' AS attribute_type, ingredient_name, cooking_technique_attribute AS attribute_value, year, star_rating, num_ratings, num_reviews
+    FROM ingredient_cooking_technique
+)
+WHERE attribute_value IS NOT NULL
+    AND LENGTH(TRIM(attribute_value)) > 0
+ORDER BY attribute_type, ingredient_name, year;
 
 
 